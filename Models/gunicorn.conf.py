@@ -0,0 +1,30 @@
+"""Production serving for the search service.
+
+    gunicorn -c Models/gunicorn.conf.py main:app    (from the repository root)
+
+The corpus, FAISS index and inverted index are built once in the master
+(preload_app) and shared with the forked workers copy-on-write; each worker
+serves requests from a small thread pool.
+"""
+import gc
+import os
+
+# Keep loaded objects' pages untouched by the collector until they are frozen before fork
+gc.disable()
+
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+bind = os.getenv("BIND", "0.0.0.0:8080")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+preload_app = True
+timeout = 60
+keepalive = 5
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
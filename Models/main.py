@@ -1,8 +1,19 @@
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
 from flask import Flask, request, jsonify
-from Product import Session
+from Product import Session, Product
 from search_index import build_product_search_corpus, build_faiss_index, search_products
 from rag import generate_answer
 
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+SEARCH_CACHE_SIZE = 4096
+
 app = Flask(__name__)
 
 # Load and build everything once at startup
@@ -10,27 +21,117 @@ session = Session()
 texts, ids = build_product_search_corpus(session)
 index, _ = build_faiss_index(texts)
 
+# Product cards are built once so a search never goes back to the database
+_products = {product.id: product for product in session.query(Product).filter(Product.id.in_(set(ids)))}
+catalog: List[Product] = []
+cards: List[Dict] = []
+card_prices = []
+card_positions: Dict = {}
+for product_id in ids:
+    if product_id in card_positions or product_id not in _products:
+        continue
+    product = _products[product_id]
+    card_positions[product_id] = len(cards)
+    catalog.append(product)
+    cards.append({"name": product.name, "sku": product.sku, "price": product.selling_price})
+    card_prices.append(float(product.selling_price or 0))
+card_prices = np.array(card_prices, dtype=np.float64)
+
+# The SQLAlchemy session is only used by the vector fallback, and is not thread-safe
+_session_lock = threading.Lock()
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+
+def build_inverted_index(texts: List[str], ids: List) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """token -> (sorted card positions, term counts) over the search corpus"""
+    postings: Dict[str, Counter] = defaultdict(Counter)
+    for text, product_id in zip(texts, ids):
+        position = card_positions.get(product_id)
+        if position is None:
+            continue
+        for token, count in Counter(tokenize(text)).items():
+            postings[token][position] += count
+    inverted = {}
+    for token, counts in postings.items():
+        positions = np.array(sorted(counts), dtype=np.int64)
+        inverted[token] = (positions, np.array([counts[p] for p in positions], dtype=np.int64))
+    return inverted
+
+
+inverted_index = build_inverted_index(texts, ids)
+
+
+@lru_cache(maxsize=SEARCH_CACHE_SIZE)
+def ranked_matches(tokens: Tuple[str, ...]) -> Tuple[int, ...]:
+    """Card positions containing every token, most term occurrences first.
+
+    Falls back to the vector index when no product contains all the keywords.
+    """
+    postings = [inverted_index.get(token) for token in tokens]
+    if tokens and all(p is not None for p in postings):
+        postings.sort(key=lambda p: len(p[0]))
+        matched = postings[0][0]
+        for positions, _ in postings[1:]:
+            matched = np.intersect1d(matched, positions, assume_unique=True)
+            if matched.size == 0:
+                break
+        if matched.size:
+            scores = np.zeros(matched.size, dtype=np.int64)
+            for positions, counts in postings:
+                scores += counts[np.searchsorted(positions, matched)]
+            order = np.argsort(-scores, kind="stable")
+            return tuple(matched[order].tolist())
+
+    with _session_lock:
+        results = search_products(list(tokens), index, texts, ids, session)
+    return tuple(card_positions[product.id] for product in results if product.id in card_positions)
+
+
 @app.route('/search', methods=['GET'])
 def search():
+    """Keyword search: ?keyword=plywood&keyword=oak[&min_price=&max_price=&page=&per_page=&summary=true]"""
     keywords = request.args.getlist('keyword')  # ?keyword=plywood&keyword=oak
-    query = ' '.join(keywords)
-    results = search_products(keywords, index, texts, ids, session)
+    try:
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', DEFAULT_PER_PAGE)), 1), MAX_PER_PAGE)
+        min_price = float(request.args['min_price']) if 'min_price' in request.args else None
+        max_price = float(request.args['max_price']) if 'max_price' in request.args else None
+    except ValueError:
+        return jsonify({"message": "page, per_page, min_price and max_price must be numbers."}), 400
+    with_summary = request.args.get('summary', 'false').lower() in ('1', 'true', 'yes')
 
-    if not results:
+    # Sorted and de-duplicated so equivalent keyword sets share a cache entry
+    tokens = tuple(sorted({token for keyword in keywords for token in tokenize(keyword)}))
+    if not tokens:
+        return jsonify({"message": "At least one keyword is required."}), 400
+    matches = np.array(ranked_matches(tokens), dtype=np.int64)
+    if min_price is not None:
+        matches = matches[card_prices[matches] >= min_price]
+    if max_price is not None:
+        matches = matches[card_prices[matches] <= max_price]
+
+    if matches.size == 0:
         return jsonify({"message": "No matching products found."}), 404
 
-    products = [{
-        "name": product.name,
-        "sku": product.sku,
-        "price": product.selling_price
-    } for product in results]
+    start = (page - 1) * per_page
+    page_positions = matches[start:start + per_page].tolist()
+    products = [cards[position] for position in page_positions]
+    response = {
+        "products": products,
+        "total": int(matches.size),
+        "page": page,
+        "per_page": per_page
+    }
+
+    # The LLM summary is a multi-second round trip, so only pay for it on request
+    if with_summary:
+        response["summary"] = generate_answer(' '.join(keywords), [catalog[position] for position in page_positions])
 
-    explanation = generate_answer(query, results)
+    return jsonify(response)
 
-    return jsonify({
-        "products": products,
-        "summary": explanation
-    })
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080)
+    app.run(host='0.0.0.0', port=8080, threaded=True)
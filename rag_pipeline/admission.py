@@ -0,0 +1,130 @@
+"""Admission control for the LLM-bound endpoints.
+
+A fixed number of LLM permits is shared by every endpoint class. When they are
+all taken, a request waits in a bounded queue, and freed permits go to the
+highest-priority class first. A request whose class queue is full, or that
+waits longer than its class allows, is shed: the caller serves a cheaper local
+answer instead of piling up behind a slow LLM. Per-user token buckets cap how
+much of the capacity any one user can take.
+
+Everything runs on the event loop, so no locks are needed.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+
+from config import LLM_CONCURRENCY, ADMISSION_CLASSES, USER_RATE_LIMIT_PER_SECOND, USER_RATE_LIMIT_BURST
+from telemetry import registry
+
+QUEUE_DEPTH = registry.gauge("shopwhisper_admission_queue_depth", "Requests waiting for an LLM permit, by class")
+IN_FLIGHT = registry.gauge("shopwhisper_admission_in_flight", "LLM permits in use")
+ADMITTED = registry.counter("shopwhisper_admission_admitted_total", "Requests given an LLM permit, by class")
+SHED = registry.counter("shopwhisper_admission_shed_total", "Requests degraded instead of queued, by class and reason")
+RATE_LIMITED = registry.counter("shopwhisper_rate_limited_total", "Requests rejected by the per-user rate limit, by class")
+
+# Bound on tracked users; the least recently seen buckets are dropped first
+MAX_TRACKED_USERS = 100_000
+
+
+class AdmissionController:
+    def __init__(self, capacity: int = LLM_CONCURRENCY, classes: Dict[str, Dict[str, float]] = ADMISSION_CLASSES):
+        self.capacity = capacity
+        self.classes = classes
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._queued: Dict[str, int] = {name: 0 for name in classes}
+        self._seq = itertools.count()
+
+    def _set_depth(self, endpoint_class: str, delta: int):
+        self._queued[endpoint_class] += delta
+        QUEUE_DEPTH.set(self._queued[endpoint_class], endpoint_class=endpoint_class)
+
+    def _release(self):
+        # Hand the permit straight to the best waiter, so in_flight stays the same
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+        IN_FLIGHT.set(self.in_flight)
+
+    async def _acquire(self, endpoint_class: str) -> bool:
+        """Take a permit, waiting if the class allows it; False means the request was shed"""
+        # Permits are handed straight to waiters on release, so a free permit means nobody is waiting
+        if self.in_flight < self.capacity:
+            self.in_flight += 1
+            IN_FLIGHT.set(self.in_flight)
+            return True
+
+        settings = self.classes[endpoint_class]
+        if self._queued[endpoint_class] >= settings["max_queue"]:
+            SHED.inc(endpoint_class=endpoint_class, reason="queue_full")
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(settings["priority"]), next(self._seq), future))
+        self._set_depth(endpoint_class, 1)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), settings["max_wait_seconds"])
+        except asyncio.TimeoutError:
+            if future.done():
+                # The permit arrived just as the wait timed out; take it
+                return True
+            future.cancel()
+            SHED.inc(endpoint_class=endpoint_class, reason="timeout")
+            return False
+        except asyncio.CancelledError:
+            # Client went away: pass on a permit we were already given, or give up our place
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._set_depth(endpoint_class, -1)
+
+    @asynccontextmanager
+    async def slot(self, endpoint_class: str):
+        """async with controller.slot("search") as admitted: full path if admitted, else degrade"""
+        admitted = await self._acquire(endpoint_class)
+        if admitted:
+            ADMITTED.inc(endpoint_class=endpoint_class)
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self._release()
+
+    def status(self) -> Dict[str, object]:
+        return {"capacity": self.capacity, "in_flight": self.in_flight, "queued": dict(self._queued)}
+
+
+class RateLimiter:
+    """Per-user token buckets: `rate` requests per second sustained, bursts of up to `burst`"""
+
+    def __init__(self, rate: float = USER_RATE_LIMIT_PER_SECOND, burst: float = USER_RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        # user_id -> (tokens, last refill time)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def allow(self, user_id: str, endpoint_class: str = "") -> Tuple[bool, float]:
+        """(allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        self._buckets[user_id] = (tokens, now)
+        if len(self._buckets) > MAX_TRACKED_USERS:
+            self._buckets.popitem(last=False)
+        if not allowed:
+            RATE_LIMITED.inc(endpoint_class=endpoint_class)
+            return False, (1.0 - tokens) / self.rate
+        return True, 0.0
@@ -1,9 +1,14 @@
 from openai import OpenAI
 import pandas as pd
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
 from config import OPENAI_API_KEY
+from user_features import extract_user_features
 from pydantic import BaseModel
+from telemetry import span, record_llm_usage
+import logging
+
+logger = logging.getLogger(__name__)
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
@@ -15,104 +20,88 @@ class AIAnalyzer:
                 "insights": [],
                 "preferences": {},
                 "recommendation_strategy": "Show popular products and trending items",
-                "purchased_products": []
+                "purchased_products": [],
+                "purchased_product_ids": []
             }
 
-        orders_summary = []
-        purchased_products = []
-
-        for _, order in user_orders.iterrows():
-            quantity = int(order['quantity'])
-            price = float(order['price_per_unit'])
-            total = float(order['total_amount'])
-            rating = float(order['rating']) if pd.notna(order['rating']) else None
-
-            orders_summary.append({
-                "product": str(order['product_name']),
-                "category": str(order['category']),
-                "brand": str(order['brand']),
-                "price": price,
-                "quantity": quantity,
-                "date": str(order['order_date']),
-                "rating": rating
-            })
-
-            purchased_products.append({
-                "order_id": str(order['order_id']),
-                "product_name": str(order['product_name']),
-                "category": str(order['category']),
-                "brand": str(order['brand']),
-                "quantity": quantity,
-                "price_per_unit": price,
-                "total_amount": total,
-                "order_date": str(order['order_date']),
-                "rating": rating
-            })
+        # Bounded summary: the prompt stays the same size however long the history is
+        features = extract_user_features(user_orders)
 
         try:
-            prompt = f"""
-            Analyze this user's purchase history and provide detailed insights:
-
-            Order History:
-            {json.dumps(orders_summary, indent=2)}
-
-            Please analyze:
-            1. Shopping patterns and preferences
-            2. Price sensitivity
-            3. Brand loyalty
-            4. Category interests
-            5. Potential future needs
-            6. Recommended product types
-
-            Return ONLY a valid JSON object in the following format:
-            {{
-                "user_type": "frequent",
-                "insights": ["Makes regular purchases of plywood products"],
-                "preferences": {{
-                    "preferred_categories": ["Plywood", "Hardware"],
-                    "preferred_brands": ["GreenPly", "Century"],
-                    "price_sensitivity": "medium",
-                    "quality_preference": "high"
-                }},
-                "recommendation_strategy": "Focus on premium quality products in preferred categories"
-            }}
-            """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a retail analytics expert. Analyze customer behavior and return ONLY valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1000
-            )
+            with span("prompt_build"):
+                prompt = self.get_behavior_prompt(features)
+
+            with span("llm_call"):
+                response = client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You are a retail analytics expert. Analyze customer behavior and return ONLY valid JSON."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.7,
+                    max_tokens=1000
+                )
+            record_llm_usage("behavior_analysis", response)
 
             response_text = response.choices[0].message.content.strip()
             if not response_text:
                 raise ValueError("Empty response from OpenAI API")
 
             try:
-                analysis = json.loads(response_text)
+                with span("json_parse"):
+                    analysis = json.loads(response_text)
             except json.JSONDecodeError as e:
-                print(f"Failed to parse OpenAI response: {response_text}")
+                logger.warning("Failed to parse OpenAI response", extra={"response_text": response_text})
                 raise ValueError(f"Invalid JSON in OpenAI response: {str(e)}")
 
             analysis.update({
-                "total_spent": float(user_orders['total_amount'].sum()),
-                "average_order_value": float(user_orders['total_amount'].mean()),
-                "total_orders": int(len(user_orders)),
-                "average_rating": float(user_orders['rating'].mean()) if user_orders['rating'].notna().any() else None,
-                "purchased_products": sorted(purchased_products, key=lambda x: x['order_date'], reverse=True)
+                "total_spent": features["total_spent"],
+                "average_order_value": features["average_order_value"],
+                "total_orders": features["total_orders"],
+                "average_rating": features["rating_stats"]["average"],
+                "purchased_products": features["recent_orders"],
+                "purchased_product_ids": features["purchased_product_ids"]
             })
 
             return analysis
 
         except Exception as e:
-            print(f"Error in AI analysis: {str(e)}")
-            return self._basic_analysis(user_orders)
+            logger.warning("AI analysis failed, using basic analysis: %s", e)
+            return self._basic_analysis(user_orders, features)
         
 
+    def get_behavior_prompt(self, features: Dict[str, Any]) -> str:
+        return f"""
+        Analyze this user's purchase history and provide detailed insights:
+
+        Purchase Summary:
+        {json.dumps({k: v for k, v in features.items() if k not in ("recent_orders", "purchased_product_ids")}, separators=(",", ":"))}
+
+        Most Recent Orders:
+        {json.dumps(features["recent_orders"], separators=(",", ":"))}
+
+        Please analyze:
+        1. Shopping patterns and preferences
+        2. Price sensitivity
+        3. Brand loyalty
+        4. Category interests
+        5. Potential future needs
+        6. Recommended product types
+
+        Return ONLY a valid JSON object in the following format:
+        {{
+            "user_type": "frequent",
+            "insights": ["Makes regular purchases of plywood products"],
+            "preferences": {{
+                "preferred_categories": ["Plywood", "Hardware"],
+                "preferred_brands": ["GreenPly", "Century"],
+                "price_sensitivity": "medium",
+                "quality_preference": "high"
+            }},
+            "recommendation_strategy": "Focus on premium quality products in preferred categories"
+        }}
+        """
+
     class UserAnalysis(BaseModel):
         product_id: int
         product_name: str
@@ -128,7 +117,7 @@ class AIAnalyzer:
     def get_recommendation_prompt(self, user_analysis: Dict[str, Any], available_products: List[Dict[str, Any]]) -> UserAnalysis:
         return f"""
         Based on this user analysis:
-        {json.dumps(user_analysis, indent=2)}
+        {json.dumps({k: v for k, v in user_analysis.items() if k != "purchased_product_ids"}, indent=2)}
 
         And these available products:
         {json.dumps(available_products, indent=2)}
@@ -176,38 +165,28 @@ class AIAnalyzer:
         4. Confidence scores should be between 0 and 1
         """
 
-    def _basic_analysis(self, user_orders: pd.DataFrame) -> Dict[str, Any]:
-        purchased_products = []
-        for _, order in user_orders.iterrows():
-            quantity = int(order['quantity'])
-            price = float(order['price_per_unit'])
-            total = float(order['total_amount'])
-            rating = float(order['rating']) if pd.notna(order['rating']) else None
-
-            purchased_products.append({
-                "order_id": str(order['order_id']),
-                "product_name": str(order['product_name']),
-                "category": str(order['category']),
-                "brand": str(order['brand']),
-                "quantity": quantity,
-                "price_per_unit": price,
-                "total_amount": total,
-                "order_date": str(order['order_date']),
-                "rating": rating
-            })
+    def _basic_analysis(self, user_orders: pd.DataFrame, features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if features is None:
+            features = extract_user_features(user_orders)
 
         return {
-            "user_type": "frequent" if len(user_orders) > 5 else "occasional",
+            "user_type": "frequent" if features["total_orders"] > 5 else "occasional",
             "insights": [
-                f"Made {len(user_orders)} purchases",
-                f"Spent total of {float(user_orders['total_amount'].sum()):.2f}"
+                f"Made {features['total_orders']} purchases",
+                f"Spent total of {features['total_spent']:.2f}"
             ],
             "preferences": {
+                # Ranked by number of orders, not spend: one large purchase doesn't make a preference
                 "preferred_categories": user_orders['category'].value_counts().index.tolist()[:3],
                 "preferred_brands": user_orders['brand'].value_counts().index.tolist()[:3],
                 "price_sensitivity": "medium",
                 "quality_preference": "medium"
             },
             "recommendation_strategy": "Based on most purchased categories and brands",
-            "purchased_products": sorted(purchased_products, key=lambda x: x['order_date'], reverse=True)
+            "total_spent": features["total_spent"],
+            "average_order_value": features["average_order_value"],
+            "total_orders": features["total_orders"],
+            "average_rating": features["rating_stats"]["average"],
+            "purchased_products": features["recent_orders"],
+            "purchased_product_ids": features["purchased_product_ids"]
         }
@@ -0,0 +1,108 @@
+"""Offline job that precomputes recommendations for every user into a RecommendationStore.
+
+Usage:
+    python batch_recommendations.py --data-path data/products.csv --workers 8 --state sqlite:///data/state.db
+
+Point --state at the serving STATE_STORE so orders ingested through the API are
+included. Each row is stored with the user's order version and the catalog's
+content id; the API serves it only while both still match.
+"""
+import argparse
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple
+
+import pandas as pd
+
+from catalog_snapshot import file_fingerprint
+from config import RECOMMENDATION_STORE_PATH, BATCH_NUM_RECOMMENDATIONS, BATCH_NUM_SHARDS, STATE_STORE
+from recommendation_store import RecommendationStore
+from recommendation_system import RecommendationSystem
+from state_store import create_state_store
+
+# Per-process recommendation system, built once by the pool initializer
+_worker_system = None
+
+
+def shard_for(user_id: str, num_shards: int) -> int:
+    """Stable shard assignment for a user ID (independent of PYTHONHASHSEED)"""
+    return zlib.crc32(str(user_id).encode("utf-8")) % num_shards
+
+
+def _init_worker(data_path: str, order_history: pd.DataFrame):
+    global _worker_system
+    # Every worker scores against the parent's order history, not its own dummy orders
+    _worker_system = RecommendationSystem(data_path=data_path, order_history=order_history)
+
+
+def _compute_shard(user_ids: List[str], num_recommendations: int) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    return [
+        (user_id, _worker_system.get_local_recommendations(user_id, num_recommendations))
+        for user_id in user_ids
+    ]
+
+
+def run(data_path: str, store_path: str = RECOMMENDATION_STORE_PATH, workers: int = None,
+        num_shards: int = BATCH_NUM_SHARDS, num_recommendations: int = BATCH_NUM_RECOMMENDATIONS,
+        state_url: str = STATE_STORE) -> Dict[str, Any]:
+    """Compute recommendations for all users and write them to the store"""
+    workers = workers or os.cpu_count() or 1
+    catalog_id = file_fingerprint(data_path)
+    # Constructing the system applies the shared order log; the history and the user versions
+    # below are then read without syncing again, so they describe the same orders
+    system = RecommendationSystem(data_path=data_path, state=create_state_store(state_url))
+    order_history = system.order_history
+    if order_history.empty:
+        print("No order history, nothing to compute")
+        return {"users": 0, "seconds": 0.0, "users_per_second": 0.0}
+
+    shards: List[List[str]] = [[] for _ in range(num_shards)]
+    order_versions: Dict[str, int] = {}
+    for user_id in order_history['user_id'].unique():
+        shards[shard_for(user_id, num_shards)].append(str(user_id))
+        order_versions[str(user_id)] = system.orders.user_version(str(user_id))
+
+    store = RecommendationStore(store_path)
+    computed_at = time.time()
+    written = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(data_path, order_history)) as pool:
+        futures = [pool.submit(_compute_shard, shard, num_recommendations) for shard in shards if shard]
+        for future in as_completed(futures):
+            # Single writer: shards are committed from the parent as they finish
+            rows = [(user_id, recommendations, order_versions[user_id]) for user_id, recommendations in future.result()]
+            written += store.put_many(rows, computed_at=computed_at, catalog_id=catalog_id)
+            elapsed = time.perf_counter() - start
+            print(f"{written} users written, {written / elapsed:.1f} users/sec")
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "users": written,
+        "shards": sum(1 for shard in shards if shard),
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "users_per_second": round(written / elapsed, 1) if elapsed > 0 else 0.0
+    }
+    print(f"Computed recommendations for {written} users in {elapsed:.2f}s "
+          f"({stats['users_per_second']} users/sec, {workers} workers)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute recommendations for all users")
+    parser.add_argument("--data-path", default="data/products.csv")
+    parser.add_argument("--store", default=RECOMMENDATION_STORE_PATH)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shards", type=int, default=BATCH_NUM_SHARDS)
+    parser.add_argument("--num-recommendations", type=int, default=BATCH_NUM_RECOMMENDATIONS)
+    parser.add_argument("--state", default=STATE_STORE, help="state store with the ingested order log")
+    args = parser.parse_args()
+    run(args.data_path, args.store, args.workers, args.shards, args.num_recommendations, args.state)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Scale benchmarks for RecommendationSystem methods and the retrieval stages.
+
+Usage:
+    python benchmark_suite.py --scales 10k:1k,1m:100k,10m:1m --products 5000 --output bench.json
+    python benchmark_suite.py --scales 100k:10k --retrieval   # also time chunk/embed/index/search
+    python benchmark_suite.py --scales 100k:10k --serialization   # per-response encode cost
+    python benchmark_suite.py --scales 1k:100 --sharding 1m   # single vs sharded FAISS search
+
+Scales are "orders:users" pairs; k and m suffixes are accepted. LLM-backed
+methods are only timed with --with-llm (point OPENAI_BASE_URL at a stand-in
+to avoid paying for them).
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Callable, Dict
+
+from catalog import ProductCatalog, CARD_FIELDS
+from data_generator import generate_catalog, generate_orders
+
+
+def parse_count(value: str) -> int:
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """Time fn and return mean/p50/p95/max in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "max_ms": round(samples[-1], 3),
+        "repeat": repeat,
+    }
+
+
+def timed_once(fn: Callable[[], Any]) -> Dict[str, float]:
+    start = time.perf_counter()
+    fn()
+    return {"seconds": round(time.perf_counter() - start, 3)}
+
+
+def bench_recommendation_system(catalog_path: str, num_orders: int, num_users: int, seed: int,
+                                repeat: int, with_llm: bool) -> Dict[str, Any]:
+    from recommendation_system import RecommendationSystem
+
+    results: Dict[str, Any] = {}
+    catalog = ProductCatalog.load(catalog_path)
+
+    start = time.perf_counter()
+    orders = generate_orders(catalog.frame, num_orders, num_users, seed=seed)
+    results["generate_orders"] = {"seconds": round(time.perf_counter() - start, 3)}
+
+    holder: Dict[str, Any] = {}
+    results["__init__"] = timed_once(
+        lambda: holder.setdefault("system", RecommendationSystem(data_path=catalog_path, order_history=orders))
+    )
+    system = holder["system"]
+
+    # Heaviest buyer, a median buyer and a user with no history
+    counts = orders['user_id'].value_counts()
+    users = {
+        "heavy": counts.index[0],
+        "median": counts.index[len(counts) // 2],
+        "cold": "no-such-user",
+    }
+    for label, user_id in users.items():
+        results[f"get_user_orders[{label}]"] = measure(lambda: system.get_user_orders(user_id), repeat)
+        user_orders = system.get_user_orders(user_id)
+        if not user_orders.empty:
+            results[f"ai_analyzer._basic_analysis[{label}]"] = measure(
+                lambda: system.ai_analyzer._basic_analysis(user_orders), repeat)
+        results[f"get_local_recommendations[{label}]"] = measure(
+            lambda: system.get_local_recommendations(user_id, 5), repeat)
+        if with_llm:
+            results[f"analyze_user_behavior[{label}]"] = measure(lambda: system.analyze_user_behavior(user_id), repeat)
+            results[f"get_recommendations[{label}]"] = measure(lambda: system.get_recommendations(user_id, 5), repeat)
+
+    analysis = system.ai_analyzer._basic_analysis(system.get_user_orders(users["median"]))
+    results["_get_basic_recommendations"] = measure(lambda: system._get_basic_recommendations(analysis, 5), repeat)
+    results["get_popular_products"] = measure(lambda: system.get_popular_products(10), repeat)
+
+    product_ids = catalog.ids()
+    batch = [
+        {"user_id": str(i % num_users + 1), "product_id": product_ids[i % len(product_ids)], "quantity": 1}
+        for i in range(1000)
+    ]
+    ingest = measure(lambda: system.ingest_orders(batch), repeat)
+    ingest["orders_per_second"] = round(len(batch) / (ingest["mean_ms"] / 1000), 1)
+    results["ingest_orders[1000]"] = ingest
+    return results
+
+
+def _convert_numpy_types(obj):
+    """The recursive conversion main.py used before responses were encoded with orjson"""
+    import numpy as np
+
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, dict):
+        return {key: _convert_numpy_types(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_convert_numpy_types(item) for item in obj]
+    return obj
+
+
+def bench_serialization(catalog_path: str, num_orders: int, num_users: int, seed: int,
+                        repeat: int) -> Dict[str, Any]:
+    """Build and encode cost of one recommendation / popular-products response, old path vs orjson"""
+    from recommendation_system import RecommendationSystem
+    from serialization import dumps
+
+    catalog = ProductCatalog.load(catalog_path)
+    orders = generate_orders(catalog.frame, num_orders, num_users, seed=seed)
+    system = RecommendationSystem(data_path=catalog_path, order_history=orders, catalog=catalog)
+    user_id = orders['user_id'].value_counts().index[0]
+    payloads = {
+        "recommendations[20]": system.get_local_recommendations(user_id, 20),
+        "popular_products[20]": system.get_popular_products(20),
+    }
+
+    results: Dict[str, Any] = {}
+    repeat = max(repeat, 1000)
+    for name, payload in payloads.items():
+        results[f"{name} convert_numpy_types+json"] = measure(
+            lambda: json.dumps(_convert_numpy_types(payload)).encode(), repeat)
+        results[f"{name} orjson"] = measure(lambda: dumps(payload), repeat)
+
+    # Building items from cached product cards instead of a pandas row per product
+    product_id = catalog.ids()[0]
+
+    def item_from_row():
+        row = catalog.get(product_id)
+        return {key: row[column] for key, column in CARD_FIELDS.items()}
+
+    results["catalog.get -> item"] = measure(item_from_row, repeat)
+    results["catalog.card -> item"] = measure(lambda: catalog.card(product_id), repeat)
+    results["get_popular_products[20]"] = measure(lambda: system.get_popular_products(20), repeat)
+    return results
+
+
+def bench_retrieval(catalog_csv: str, repeat: int) -> Dict[str, Any]:
+    from document_loader import load_and_split_csv
+    from embedder import Embedder
+    from vector_store import VectorStore
+
+    results: Dict[str, Any] = {}
+    holder: Dict[str, Any] = {}
+    results["load_and_split_csv"] = timed_once(lambda: holder.setdefault("chunks", load_and_split_csv(catalog_csv)))
+    chunks = holder["chunks"]
+    results["num_chunks"] = len(chunks)
+
+    embedder = Embedder()
+    results["embed[corpus]"] = timed_once(lambda: holder.setdefault("embeddings", embedder.embed(chunks)))
+    embeddings = holder["embeddings"]
+
+    store = VectorStore(dimension=len(embeddings[0]))
+    results["vector_store.add"] = timed_once(lambda: store.add(embeddings, chunks))
+
+    query = "waterproof plywood for bathrooms"
+    results["embed[query]"] = measure(lambda: embedder.embed([query]), repeat)
+    query_embedding = embedder.embed([query])
+    results["vector_store.search"] = measure(lambda: store.search(query_embedding, 5), repeat)
+    return results
+
+
+def bench_sharded_search(num_vectors: int, num_shards: int, repeat: int, dimension: int = 384,
+                         seed: int = 42) -> Dict[str, Any]:
+    """One flat index vs the same random vectors in num_shards category shards (no embedding model needed)"""
+    import numpy as np
+    from vector_store import VectorStore, ShardedVectorStore
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.random((num_vectors, dimension), dtype=np.float32)
+    docs = [str(i) for i in range(num_vectors)]
+    keys = [f"category-{i % num_shards}" for i in range(num_vectors)]
+    query = rng.random((1, dimension), dtype=np.float32)
+
+    results: Dict[str, Any] = {}
+    single = VectorStore(dimension)
+    results["single.add"] = timed_once(lambda: single.add(vectors, docs))
+    sharded = ShardedVectorStore(dimension)
+    results["sharded.add"] = timed_once(lambda: sharded.add(vectors, docs, keys))
+    results["single.search"] = measure(lambda: single.search(query, 5), repeat)
+    results["sharded.search[all]"] = measure(lambda: sharded.search(query, 5), repeat)
+    results["sharded.search[1 shard]"] = measure(lambda: sharded.search(query, 5, shards=["category-0"]), repeat)
+    shard_rows = [i for i, key in enumerate(keys) if key == "category-0"]
+    results["sharded.rebuild_shard"] = timed_once(
+        lambda: sharded.rebuild_shard("category-0", vectors[shard_rows], [docs[i] for i in shard_rows]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recommendation and retrieval code at scale")
+    parser.add_argument("--scales", default="1k:100,100k:10k,1m:100k", help="comma-separated orders:users pairs")
+    parser.add_argument("--products", default="1k", help="catalog size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--retrieval", action="store_true", help="also benchmark chunking, embedding and FAISS")
+    parser.add_argument("--with-llm", action="store_true", help="also time LLM-backed methods")
+    parser.add_argument("--serialization", action="store_true", help="also time response encoding")
+    parser.add_argument("--sharding", default=None, help="vector count for the sharded FAISS search benchmark")
+    parser.add_argument("--shards", type=int, default=8)
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    args = parser.parse_args()
+
+    num_products = parse_count(args.products)
+    report: Dict[str, Any] = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "products": num_products,
+        "seed": args.seed,
+        "scales": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog_csv = os.path.join(tmp, "products.csv")
+        generate_catalog(num_products, seed=args.seed).to_csv(catalog_csv, index=False)
+
+        for scale in args.scales.split(","):
+            orders_part, users_part = scale.split(":")
+            num_orders, num_users = parse_count(orders_part), parse_count(users_part)
+            print(f"== {num_orders} orders / {num_users} users / {num_products} products")
+            scale_results = bench_recommendation_system(catalog_csv, num_orders, num_users, args.seed,
+                                                        args.repeat, args.with_llm)
+            for name, value in scale_results.items():
+                print(f"  {name:45s} {json.dumps(value)}")
+            report["scales"][scale] = scale_results
+
+            if args.serialization:
+                serialization_results = bench_serialization(catalog_csv, num_orders, num_users, args.seed,
+                                                            args.repeat)
+                for name, value in serialization_results.items():
+                    print(f"  {name:45s} {json.dumps(value)}")
+                report["scales"][scale]["serialization"] = serialization_results
+
+        if args.retrieval:
+            print(f"== retrieval over {num_products} products")
+            report["retrieval"] = bench_retrieval(catalog_csv, args.repeat)
+            for name, value in report["retrieval"].items():
+                print(f"  {name:45s} {json.dumps(value)}")
+
+    if args.sharding:
+        num_vectors = parse_count(args.sharding)
+        print(f"== FAISS search over {num_vectors} vectors, {args.shards} shards")
+        report["sharding"] = bench_sharded_search(num_vectors, args.shards, args.repeat, seed=args.seed)
+        for name, value in report["sharding"].items():
+            print(f"  {name:45s} {json.dumps(value)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
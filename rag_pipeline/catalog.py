@@ -0,0 +1,154 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ['Category', 'Sub-Category', 'Material', 'Thickness', 'Size', 'Color', 'Brand', 'Discount']
+FLAG_COLUMNS = ['Waterproof', 'Termite-Proof', 'Fire-Rated']
+NUMERIC_COLUMNS = ['Price', 'Rating', 'Stock']
+# Response key -> column for the product fields every recommendation and popular-product item carries
+CARD_FIELDS = {
+    'product_id': 'ID',
+    'product_name': 'Product Name',
+    'category': 'Category',
+    'brand': 'Brand',
+    'price': 'Price',
+}
+
+
+def _normalize(frame: pd.DataFrame) -> pd.DataFrame:
+    """Parse the raw product table into compact, typed columns (done once at load time)"""
+    frame = frame.copy()
+    if 'ID' in frame.columns:
+        frame['ID'] = pd.to_numeric(frame['ID']).astype('int64')
+    for col in NUMERIC_COLUMNS:
+        if col in frame.columns:
+            frame[col] = pd.to_numeric(frame[col], errors='coerce')
+    for col in CATEGORICAL_COLUMNS:
+        if col in frame.columns and not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = frame[col].astype('category')
+    for col in FLAG_COLUMNS:
+        if col in frame.columns and not isinstance(frame[col].dtype, pd.CategoricalDtype):
+            frame[col] = pd.Categorical(frame[col], categories=['No', 'Yes'])
+    if 'Discount' in frame.columns and 'Discount_Pct' not in frame.columns:
+        # "5%" -> 5.0, kept alongside the display string
+        frame['Discount_Pct'] = pd.to_numeric(
+            frame['Discount'].astype(str).str.rstrip('%'), errors='coerce'
+        ).fillna(0.0).astype('float64')
+    if 'isSponsored' in frame.columns and frame['isSponsored'].dtype != bool:
+        frame['isSponsored'] = frame['isSponsored'].astype(str).str.upper().eq('TRUE')
+    return frame
+
+
+class ProductCatalog:
+    """Read-only product table with an ID -> row index for O(1) lookups.
+
+    version is set by the snapshot manager when the catalog is swapped in, so
+    anything derived from a catalog can be keyed by it.
+    """
+
+    def __init__(self, frame: pd.DataFrame, normalized: bool = False, version: int = 0):
+        self.frame = frame if normalized else _normalize(frame)
+        self.version = version
+        self._category_average_prices: Optional[Dict[str, float]] = None
+        self._cards: Optional[Dict[int, Dict[str, Any]]] = None
+        self._row_by_id: Dict[int, int] = (
+            {int(product_id): pos for pos, product_id in enumerate(self.frame['ID'].tolist())}
+            if 'ID' in self.frame.columns else {}
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ProductCatalog":
+        """Load from .csv, .parquet or .arrow/.feather depending on the file extension"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.parquet':
+            return cls.from_parquet(path)
+        if ext in ('.arrow', '.feather'):
+            return cls.from_arrow(path)
+        return cls.from_csv(path)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "ProductCatalog":
+        return cls(pd.read_csv(path))
+
+    @classmethod
+    def from_parquet(cls, path: str) -> "ProductCatalog":
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, memory_map=True)
+        return cls(_normalize(table.to_pandas(split_blocks=True)), normalized=True)
+
+    @classmethod
+    def from_arrow(cls, path: str) -> "ProductCatalog":
+        """Memory-map an uncompressed Arrow IPC file.
+
+        Numeric columns without nulls are zero-copy views over the mapped pages, so
+        workers that open the same file share them through the OS page cache.
+        """
+        import pyarrow as pa
+
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        return cls(_normalize(table.to_pandas(split_blocks=True)), normalized=True)
+
+    def save(self, path: str):
+        """Write the normalized catalog as .parquet or uncompressed .arrow for fast reloads"""
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(self.frame, preserve_index=False)
+        if os.path.splitext(path)[1].lower() == '.parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(table, path)
+        else:
+            with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __contains__(self, product_id: Any) -> bool:
+        return int(product_id) in self._row_by_id
+
+    def get(self, product_id: Any) -> pd.Series:
+        """Return the product row for an ID; raises KeyError if it is not in the catalog"""
+        return self.frame.iloc[self._row_by_id[int(product_id)]]
+
+    def find(self, product_id: Any) -> Optional[pd.Series]:
+        try:
+            return self.get(product_id)
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    def card(self, product_id: Any) -> Dict[str, Any]:
+        """Response fields for a product as plain Python values; raises KeyError if it is not in the catalog.
+
+        All cards are built in one columnar pass the first time one is asked for,
+        so lookups skip the per-row Series that get() has to construct.
+        """
+        cards = self._cards
+        if cards is None:
+            columns = [self.frame[column].tolist() for column in CARD_FIELDS.values()] if not self.frame.empty else []
+            keys = list(CARD_FIELDS)
+            cards = {int(values[0]): dict(zip(keys, values)) for values in zip(*columns)}
+            self._cards = cards
+        return dict(cards[int(product_id)])
+
+    def category_average_prices(self) -> Dict[str, float]:
+        """Mean price per category, computed once per catalog"""
+        if self._category_average_prices is None:
+            self._category_average_prices = (
+                self.frame.groupby('Category', observed=True)['Price'].mean().to_dict()
+                if not self.frame.empty else {}
+            )
+        return self._category_average_prices
+
+    def ids(self) -> List[int]:
+        return list(self._row_by_id)
+
+    def records(self) -> List[Dict[str, Any]]:
+        return self.frame.to_dict('records')
@@ -0,0 +1,278 @@
+"""Versioned catalog snapshots with background rebuild and atomic swap.
+
+A snapshot bundles one version of the product catalog with the retrieval index
+built from the same source. Request handlers read `manager.current` once and
+use that snapshot to the end, so a swap never changes data under a request in
+flight. Rebuilds run off the request path: the catalog is parsed on a
+background thread and the index is built in a separate process, then loaded by
+memory map.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from catalog import ProductCatalog
+from config import (INDEX_DIR, CATALOG_POLL_SECONDS, VECTOR_SHARD_COLUMN, STATE_PURGE_SECONDS,
+                    INDEX_BUILD_LOCK_SECONDS, INDEX_BUILD_POLL_SECONDS)
+from document_loader import load_and_split_csv, load_rows_by_column
+from embedder import Embedder
+from retriever import Retriever, index_directory
+from state_store import StateStore, LocalStateStore
+from telemetry import registry
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = registry.gauge("shopwhisper_catalog_version", "Version of the catalog snapshot being served")
+CATALOG_RELOADS = registry.counter("shopwhisper_catalog_reloads_total", "Catalog rebuilds, by outcome")
+
+
+class CatalogSnapshot:
+    """version counts swaps in this process only; content_id is the same in every worker serving the same products file"""
+
+    def __init__(self, version: int, catalog: ProductCatalog, retriever: Optional[Retriever],
+                 source_mtimes: Tuple[Optional[float], ...], content_id: str = ""):
+        self.version = version
+        self.catalog = catalog
+        self.retriever = retriever
+        self.source_mtimes = source_mtimes
+        self.content_id = content_id
+        self.loaded_at = time.time()
+
+
+def _mtime(path: Optional[str]) -> Optional[float]:
+    try:
+        return os.path.getmtime(path) if path else None
+    except OSError:
+        return None
+
+
+def file_fingerprint(path: Optional[str]) -> str:
+    """SHA-1 of a file's bytes, or "" if it can't be read"""
+    digest = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except (OSError, TypeError):
+        return ""
+    return digest.hexdigest()
+
+
+def load_documents(documents_path: str) -> Tuple[List[str], Optional[List[str]]]:
+    """(texts, shard keys): rows keyed by VECTOR_SHARD_COLUMN when it is set, else unsharded text chunks"""
+    if VECTOR_SHARD_COLUMN:
+        return load_rows_by_column(documents_path, VECTOR_SHARD_COLUMN)
+    return load_and_split_csv(documents_path), None
+
+
+def build_index_in_subprocess(documents_path: str, index_dir: str) -> str:
+    """Chunk and embed documents_path in a child process; returns the saved index directory"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "build-index", documents_path, "--index-dir", index_dir],
+        check=True, stdout=subprocess.PIPE, text=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+class CatalogManager:
+    """Owns the current CatalogSnapshot and replaces it when the sources change or a reload is requested.
+
+    Reload requests are recorded in the state store, so with a shared store one
+    request reloads every worker process. Only one of them builds the new index;
+    the others wait for it to be saved and memory-map it.
+    """
+
+    def __init__(self, products_path: str, documents_path: Optional[str] = None, index_dir: str = INDEX_DIR,
+                 state: Optional[StateStore] = None, poll_interval: float = CATALOG_POLL_SECONDS):
+        self.products_path = products_path
+        self.documents_path = documents_path
+        self.index_dir = index_dir
+        self.state = state if state is not None else LocalStateStore()
+        self.poll_interval = poll_interval
+        self.embedder: Optional[Embedder] = None
+        self.last_error: Optional[str] = None
+        self.reloading = False
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self._wake = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_pid: Optional[int] = None
+        self._failed_mtimes: Optional[Tuple[Optional[float], ...]] = None
+        self._last_purge = time.monotonic()
+        self._generation = self._requested_generation()
+        self._snapshot = self._build(1, initial=True)
+        CATALOG_VERSION.set(self._snapshot.version)
+
+    @property
+    def current(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    def on_swap(self, callback: Callable[[CatalogSnapshot], None]):
+        """Call callback(snapshot) after each swap, e.g. to hand the new catalog to RecommendationSystem"""
+        self._listeners.append(callback)
+
+    def _requested_generation(self) -> int:
+        return int(self.state.get("catalog", "generation") or 0)
+
+    def _source_mtimes(self) -> Tuple[Optional[float], ...]:
+        return _mtime(self.products_path), _mtime(self.documents_path)
+
+    def _build(self, version: int, initial: bool = False) -> CatalogSnapshot:
+        mtimes = self._source_mtimes()
+        content_id = file_fingerprint(self.products_path)
+        try:
+            catalog = ProductCatalog.load(self.products_path)
+        except FileNotFoundError:
+            if not initial:
+                raise
+            logger.warning("Products file not found at %s, using an empty catalog", self.products_path)
+            catalog = ProductCatalog(pd.DataFrame([]))
+        catalog.version = version
+
+        retriever = None
+        if self.documents_path and os.path.exists(self.documents_path):
+            if self.embedder is None:
+                self.embedder = Embedder()
+            if os.path.isdir(self.documents_path):
+                # An index directory saved by ingest_catalog.py
+                retriever = Retriever.load(self.documents_path, self.embedder)
+            elif initial:
+                texts, shard_keys = load_documents(self.documents_path)
+                retriever = Retriever.load_or_build(texts, self.index_dir, self.embedder, shard_keys)
+            else:
+                retriever = Retriever.load(self._shared_index_build(), self.embedder)
+        return CatalogSnapshot(version, catalog, retriever, mtimes, content_id)
+
+    def _shared_index_build(self) -> str:
+        """Saved index directory for documents_path, built by whichever worker takes the build lock"""
+        key = f"{file_fingerprint(self.documents_path)}:{VECTOR_SHARD_COLUMN}"
+        directory = self.state.get("index_builds", key)
+        if directory and os.path.isdir(directory):
+            return directory
+        if self.state.set_if_absent("index_build_locks", key, os.getpid(), ttl=INDEX_BUILD_LOCK_SECONDS):
+            try:
+                directory = build_index_in_subprocess(self.documents_path, self.index_dir)
+                self.state.set("index_builds", key, directory)
+                return directory
+            finally:
+                self.state.delete("index_build_locks", key)
+
+        logger.info("Waiting for another worker to build the index for %s", self.documents_path)
+        while True:
+            time.sleep(INDEX_BUILD_POLL_SECONDS)
+            # The builder publishes the directory before releasing the lock, so read the lock first
+            building = self.state.get("index_build_locks", key) is not None
+            directory = self.state.get("index_builds", key)
+            if directory and os.path.isdir(directory):
+                return directory
+            if not building:
+                raise RuntimeError(f"Index build for {self.documents_path} failed in another worker")
+
+    def _rebuild(self):
+        self.reloading = True
+        started = time.perf_counter()
+        try:
+            snapshot = self._build(self._snapshot.version + 1)
+        except Exception as e:
+            self.last_error = str(e)
+            # Don't retry the same broken file on every poll; wait for it to change again
+            self._failed_mtimes = self._source_mtimes()
+            CATALOG_RELOADS.inc(outcome="error")
+            logger.exception("Catalog rebuild failed; still serving version %d", self._snapshot.version)
+            return
+        finally:
+            self.reloading = False
+        # A single reference assignment: requests that already hold the old snapshot keep it
+        self._snapshot = snapshot
+        self.last_error = None
+        CATALOG_VERSION.set(snapshot.version)
+        CATALOG_RELOADS.inc(outcome="ok")
+        logger.info("Swapped in catalog version %d", snapshot.version,
+                    extra={"products": len(snapshot.catalog), "seconds": round(time.perf_counter() - started, 3)})
+        for callback in self._listeners:
+            callback(snapshot)
+
+    def _changed(self) -> bool:
+        generation = self._requested_generation()
+        if generation != self._generation:
+            self._generation = generation
+            return True
+        mtimes = self._source_mtimes()
+        return mtimes != self._snapshot.source_mtimes and mtimes != self._failed_mtimes
+
+    def _purge_state(self):
+        """Drop expired sessions and other TTL entries, which the stores otherwise keep forever"""
+        now = time.monotonic()
+        if now - self._last_purge < STATE_PURGE_SECONDS:
+            return
+        self._last_purge = now
+        purged = self.state.purge_expired()
+        if purged:
+            logger.info("Purged %d expired state entries", purged)
+
+    def _watch(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                if self._changed():
+                    self._rebuild()
+            except Exception:
+                logger.exception("Catalog watcher check failed")
+            try:
+                self._purge_state()
+            except Exception:
+                logger.exception("State store purge failed")
+
+    def start(self):
+        """Start the watcher thread (again after a fork: threads don't survive it)"""
+        if self._watcher is not None and self._watcher.is_alive() and self._watcher_pid == os.getpid():
+            return
+        self._wake = threading.Event()
+        self._watcher = threading.Thread(target=self._watch, name="catalog-watcher", daemon=True)
+        self._watcher_pid = os.getpid()
+        self._watcher.start()
+
+    def request_reload(self) -> int:
+        """Ask every worker sharing the state store to rebuild; returns the new reload generation"""
+        generation = self.state.incr("catalog", "generation")
+        self._wake.set()
+        return generation
+
+    def status(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "content_id": snapshot.content_id,
+            "products": len(snapshot.catalog),
+            "documents": len(snapshot.retriever.texts) if snapshot.retriever is not None else 0,
+            "shards": sorted(snapshot.retriever.store.shards)
+            if snapshot.retriever is not None and snapshot.retriever.sharded else None,
+            "loaded_at": snapshot.loaded_at,
+            "reloading": self.reloading,
+            "last_error": self.last_error
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and save the retrieval index for a documents CSV")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build-index")
+    build.add_argument("documents_path")
+    build.add_argument("--index-dir", default=INDEX_DIR)
+    args = parser.parse_args()
+
+    texts, shard_keys = load_documents(args.documents_path)
+    Retriever.load_or_build(texts, args.index_dir, shard_keys=shard_keys)
+    print(index_directory(texts, args.index_dir, shard_keys))
+
+
+if __name__ == "__main__":
+    main()
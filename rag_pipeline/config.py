@@ -1,9 +1,81 @@
+import os
+
 OPENAI_API_KEY = "your-key"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 TOP_K = 5
+# Context builder: chunks fetched before dedupe/MMR, and the prompt context budget
+CONTEXT_CANDIDATES = 20
+CONTEXT_TOKEN_BUDGET = 1500
+CONTEXT_MMR_LAMBDA = 0.7
+CONTEXT_CHARS_PER_TOKEN = 4
 PDF_PATH = "/Users/chayanchakraborty/Downloads/dummy-data.csv"
+RECOMMENDATION_STORE_PATH = "data/recommendations.db"
+RECOMMENDATION_MAX_AGE_SECONDS = 24 * 60 * 60
+BATCH_NUM_RECOMMENDATIONS = 20
+BATCH_NUM_SHARDS = 16
+ORDER_COMPACT_THRESHOLD = 1024
+ORDER_MAX_SEGMENTS = 8
+DUMMY_NUM_ORDERS = 1000
+DUMMY_NUM_USERS = 100
+DUMMY_ORDER_SEED = 42
+# Last day of the dummy order history as YYYY-MM-DD, e.g. to reproduce a run; "" ends it on the day the
+# app starts (the preloaded master generates it once, so every worker serves the same orders)
+DUMMY_ORDER_END_DATE = os.getenv("DUMMY_ORDER_END_DATE", "")
+RECENT_ORDERS_LIMIT = 10
+# Distinct purchased products (most recent first) kept per user to avoid recommending them again
+PURCHASED_PRODUCTS_LIMIT = 500
+TOP_FEATURE_VALUES = 5
+PRICE_BANDS = [0, 100, 500, 2000, 10000]
+TRENDING_HALF_LIVES_DAYS = [7, 30]
+TRENDING_WINDOWS_DAYS = [7, 30, 90]
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "local" keeps sessions and ingested orders in process; use sqlite:///path to share them between workers
+STATE_STORE = os.getenv("STATE_STORE", "local")
+INDEX_DIR = "data/index"
+# Documents column to shard the retrieval index by (one document per row); "" keeps one index over text chunks
+VECTOR_SHARD_COLUMN = os.getenv("VECTOR_SHARD_COLUMN", "")
+VECTOR_HASH_SHARDS = 8
+VECTOR_SEARCH_THREADS = 4
+# Streaming ingest (ingest_catalog.py): CSV rows read per block, chunks per embedding call
+INGEST_BLOCK_ROWS = 10_000
+INGEST_BATCH_SIZE = 256
+SESSION_TTL_SECONDS = 60 * 60
+CATALOG_POLL_SECONDS = 5
+# On a reload one worker builds the new index while the others wait for it; the build lock expires after
+INDEX_BUILD_LOCK_SECONDS = 60 * 60
+INDEX_BUILD_POLL_SECONDS = 1.0
+# Required in the X-Admin-Token header by the /admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# How often the catalog watcher deletes expired sessions and other TTL entries from the state store
+STATE_PURGE_SECONDS = 300
+# Concurrent LLM calls per worker; requests beyond that queue per endpoint class, lower priority value first
+LLM_CONCURRENCY = 8
+ADMISSION_CLASSES = {
+    "search": {"priority": 0, "max_queue": 32, "max_wait_seconds": 2.0},
+    "recommendations": {"priority": 1, "max_queue": 16, "max_wait_seconds": 1.0},
+    "behavior": {"priority": 2, "max_queue": 8, "max_wait_seconds": 0.5},
+}
+USER_RATE_LIMIT_PER_SECOND = 2.0
+USER_RATE_LIMIT_BURST = 10
+# Encoded responses kept per worker, keyed by ETag
+RESPONSE_CACHE_SIZE = 4096
+POPULAR_PRODUCTS_CACHE_CONTROL = "public, max-age=60"
+# Upper bound on num_products / num_categories in the popularity endpoints
+MAX_POPULAR_RESULTS = 100
+# Per-user answers: private to the client, revalidated with If-None-Match on every use
+RECOMMENDATIONS_CACHE_CONTROL = "private, no-cache"
+# Fraction of requests profiled. When PROFILE_HEADER is set (e.g. "X-Debug-Profile"), a request with that
+# header set to 1 and a valid X-Admin-Token is always profiled; "" disables the header
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "")
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_MAX_DEPTH = 64
+PROFILE_DIR = "data/profiles"
+PROFILE_KEEP = 200
+# Frames kept per tracemalloc trace; 0 leaves tracemalloc off (it slows allocation-heavy code noticeably)
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "0"))
 FALL_BACK_DATA = {
         "products": [
             {
@@ -0,0 +1,170 @@
+"""Compacts retrieved chunks into the prompt context.
+
+Retrieval over-fetches CONTEXT_CANDIDATES chunks, which are split into product
+rows; a row repeated by the chunk overlap is kept once (the most complete
+copy). Each row is scored against the query: the similarity of its chunk's
+vector to the query vector, plus how much of the question (weighted towards
+words that few candidate rows share) appears in its values. Rows are ordered by
+maximal marginal relevance over those scores, with value overlap between rows
+as the redundancy, and packed in that order into CONTEXT_TOKEN_BUDGET; a row
+that doesn't fit is skipped so smaller rows after it can still be used. Each
+row keeps every column the generator's output schema is filled from, plus any
+other column the question mentions by name or value; empty values are dropped.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_MMR_LAMBDA, CONTEXT_CHARS_PER_TOKEN
+from generator import SCHEMA_SOURCE_COLUMNS
+from telemetry import span
+
+FIELD_SEPARATOR = " | "
+SCHEMA_COLUMNS = sorted({column for columns in SCHEMA_SOURCE_COLUMNS.values() for column in columns})
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // CONTEXT_CHARS_PER_TOKEN)
+
+
+def _tokens(text: str) -> Set[str]:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def mmr_order(relevance: np.ndarray, similarity: np.ndarray, lambda_: float = CONTEXT_MMR_LAMBDA) -> List[int]:
+    """Indices by maximal marginal relevance: each next pick maximizes lambda * relevance - (1 - lambda) * redundancy"""
+    if len(relevance) == 0:
+        return []
+    order = [int(np.argmax(relevance))]
+    redundancy = similarity[order[0]].copy()
+    remaining = np.ones(len(relevance), dtype=bool)
+    remaining[order[0]] = False
+    while remaining.any():
+        scores = np.where(remaining, lambda_ * relevance - (1 - lambda_) * redundancy, -np.inf)
+        pick = int(np.argmax(scores))
+        order.append(pick)
+        remaining[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick])
+    return order
+
+
+def _vector_relevance(query_vector: Optional[np.ndarray], vectors: List[np.ndarray]) -> np.ndarray:
+    """Cosine similarity of each vector to the query; zeros without a query vector"""
+    if query_vector is None or not vectors:
+        return np.zeros(len(vectors))
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    return matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+
+
+def _lexical_relevance(question_tokens: Set[str], row_tokens: List[Set[str]]) -> np.ndarray:
+    """Share of the question's matching words found in each row, weighted by inverse row frequency"""
+    counts: Dict[str, int] = {}
+    for tokens in row_tokens:
+        for token in tokens & question_tokens:
+            counts[token] = counts.get(token, 0) + 1
+    if not counts:
+        return np.zeros(len(row_tokens))
+    weights = {token: np.log(1 + len(row_tokens) / count) for token, count in counts.items()}
+    total = sum(weights.values())
+    return np.array([sum(weights.get(token, 0.0) for token in tokens) / total for tokens in row_tokens])
+
+
+def _overlap(row_tokens: List[Set[str]]) -> np.ndarray:
+    """Jaccard similarity of every pair of rows' value tokens"""
+    similarity = np.eye(len(row_tokens))
+    for i in range(len(row_tokens)):
+        for j in range(i + 1, len(row_tokens)):
+            union = len(row_tokens[i] | row_tokens[j])
+            similarity[i, j] = similarity[j, i] = len(row_tokens[i] & row_tokens[j]) / union if union else 0.0
+    return similarity
+
+
+def _parse_row(row: str) -> List[Tuple[str, str]]:
+    fields = []
+    for part in row.split(FIELD_SEPARATOR):
+        key, sep, value = part.partition(": ")
+        fields.append((key.strip(), value.strip()) if sep else ("", part.strip()))
+    return fields
+
+
+def _row_key(fields: List[Tuple[str, str]]) -> Optional[str]:
+    for key, value in fields:
+        if key.lower() == "id" and value:
+            return value
+    return None
+
+
+def prune_columns(fields: List[Tuple[str, str]], question_tokens: Set[str],
+                  keep: Sequence[str] = SCHEMA_COLUMNS) -> str:
+    """Keep the schema's source columns, plus any other column the question mentions; drop empty values"""
+    keep_lower = {column.lower() for column in keep}
+    kept = []
+    for key, value in fields:
+        if not value or value.lower() in ("nan", "none"):
+            continue
+        if not key or key.lower() in keep_lower or _tokens(key) & question_tokens or _tokens(value) & question_tokens:
+            kept.append(f"{key}: {value}" if key else value)
+    return FIELD_SEPARATOR.join(kept)
+
+
+def build_context(question: str, query_vector: Optional[np.ndarray], hits: List[tuple],
+                  token_budget: int = CONTEXT_TOKEN_BUDGET) -> List[str]:
+    """Packed context rows from (distance, chunk, vector) hits, most useful first"""
+    with span("context_build"):
+        # Identical chunks (the same text stored twice, or returned twice) count once
+        unique: Dict[str, np.ndarray] = {}
+        for _, chunk, vector in hits:
+            unique.setdefault(chunk, vector)
+        chunks = list(unique)
+        chunk_relevance = _vector_relevance(query_vector, [unique[chunk] for chunk in chunks])
+
+        # Product rows; a row cut by a chunk boundary is replaced by a fuller copy, and a row
+        # found in several chunks takes the relevance of the closest one
+        rows: Dict[str, List[Tuple[str, str]]] = {}
+        lengths: Dict[str, int] = {}
+        relevance: Dict[str, float] = {}
+        order: List[str] = []
+        for chunk, score in zip(chunks, chunk_relevance):
+            for line in chunk.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                fields = _parse_row(line)
+                key = _row_key(fields) or line
+                if key not in rows:
+                    order.append(key)
+                    rows[key] = fields
+                    lengths[key] = len(line)
+                    relevance[key] = float(score)
+                    continue
+                if len(line) > lengths[key]:
+                    rows[key] = fields
+                    lengths[key] = len(line)
+                relevance[key] = max(relevance[key], float(score))
+        # Fragments without an ID that are contained in a full row add nothing
+        full_rows = [FIELD_SEPARATOR.join(f"{k}: {v}" if k else v for k, v in rows[key])
+                     for key in order if _row_key(rows[key]) is not None]
+        order = [key for key in order
+                 if _row_key(rows[key]) is not None or not any(key in full for full in full_rows)]
+        if not order:
+            return []
+
+        question_tokens = _tokens(question)
+        row_tokens = [set().union(*(_tokens(value) for _, value in rows[key])) for key in order]
+        scores = np.array([relevance[key] for key in order]) + _lexical_relevance(question_tokens, row_tokens)
+        ranked = [order[i] for i in mmr_order(scores, _overlap(row_tokens))]
+
+        packed: List[str] = []
+        used = 0
+        for key in ranked:
+            row = prune_columns(rows[key], question_tokens)
+            cost = estimate_tokens(row)
+            if packed and used + cost > token_budget:
+                # A smaller row further down may still fit
+                continue
+            packed.append(row)
+            used += cost
+        return packed
@@ -0,0 +1,180 @@
+"""Deterministic, vectorized generator for synthetic catalogs and order histories.
+
+Usage:
+    python data_generator.py --products 10000 --orders 10000000 --users 1000000 \
+        --seed 42 --out-dir data/synthetic --format parquet
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from catalog import ProductCatalog
+
+CATEGORIES = {
+    'Plywood': ['Waterproof', 'Interior', 'Decorative', 'Fire Retardant'],
+    'Laminate': ['Decorative', 'Accessories', 'Compact'],
+    'Hardware': ['Handles', 'Hinges', 'Locks', 'Channels'],
+    'Adhesive': ['Wood Glue', 'Contact Adhesive', 'Epoxy'],
+    'Furniture': ['Dining', 'Bedroom', 'Office'],
+}
+BRANDS = {
+    'Plywood': ['GreenPly', 'Century', 'Kitply', 'Archidply'],
+    'Laminate': ['Merino', 'Sunmica', 'Greenlam', 'Royale Touche'],
+    'Hardware': ['Hafele', 'Hettich', 'Ebco', 'Godrej'],
+    'Adhesive': ['Fevicol', 'Araldite', 'Pidilite'],
+    'Furniture': ['Durian', 'Godrej Interio', 'Nilkamal'],
+}
+PRICE_RANGES = {
+    'Plywood': (800, 3500), 'Laminate': (60, 1500), 'Hardware': (10, 900),
+    'Adhesive': (20, 600), 'Furniture': (4000, 60000),
+}
+# Categories bought in bulk get larger order quantities
+BULK_CATEGORIES = ['Hardware', 'Adhesive']
+RATING_VALUES = np.array([3.0, 3.5, 4.0, 4.5, 5.0])
+
+
+def _zipf_weights(rng: np.random.Generator, n: int, exponent: float) -> np.ndarray:
+    """Zipf-like weights assigned to a random permutation of n items"""
+    ranks = rng.permutation(n) + 1
+    weights = 1.0 / np.power(ranks, exponent)
+    return weights / weights.sum()
+
+
+def generate_catalog(num_products: int, seed: int = 42) -> pd.DataFrame:
+    """Product table with the same columns as data/products.csv"""
+    rng = np.random.default_rng(seed)
+    categories = np.array(list(CATEGORIES))
+    category = categories[rng.integers(0, len(categories), num_products)]
+
+    sub_category = np.empty(num_products, dtype=object)
+    brand = np.empty(num_products, dtype=object)
+    price = np.empty(num_products, dtype=np.int64)
+    for name in categories:
+        mask = category == name
+        count = int(mask.sum())
+        sub_category[mask] = np.array(CATEGORIES[name], dtype=object)[rng.integers(0, len(CATEGORIES[name]), count)]
+        brand[mask] = np.array(BRANDS[name], dtype=object)[rng.integers(0, len(BRANDS[name]), count)]
+        low, high = PRICE_RANGES[name]
+        # Log-uniform prices: many cheap items, a long tail of expensive ones
+        price[mask] = np.exp(rng.uniform(np.log(low), np.log(high), count)).round().astype(np.int64)
+
+    ids = np.arange(1, num_products + 1)
+    yes_no = np.array(['No', 'Yes'], dtype=object)
+    return pd.DataFrame({
+        'ID': ids,
+        'Product Name': [f"{b} {s} {c} #{i}" for i, b, s, c in zip(ids, brand, sub_category, category)],
+        'Category': category,
+        'Sub-Category': sub_category,
+        'Material': np.array(['Hardwood', 'Softwood', 'MDF', 'Steel', 'Aluminum', 'Synthetic'], dtype=object)[rng.integers(0, 6, num_products)],
+        'Thickness': np.array(['1mm', '2mm', '12mm', '18mm', '19mm', 'N/A'], dtype=object)[rng.integers(0, 6, num_products)],
+        'Size': np.array(['8x4 ft', '7x3 ft', '4 inch', '1kg', 'N/A'], dtype=object)[rng.integers(0, 5, num_products)],
+        'Color': np.array(['Brown', 'Light Brown', 'Golden', 'White', 'Silver', 'Black'], dtype=object)[rng.integers(0, 6, num_products)],
+        'Price': price,
+        'Brand': brand,
+        'Waterproof': yes_no[rng.integers(0, 2, num_products)],
+        'Termite-Proof': yes_no[rng.integers(0, 2, num_products)],
+        'Fire-Rated': yes_no[rng.integers(0, 2, num_products)],
+        'Usage': np.array(['Furniture', 'Kitchen', 'Bathrooms Boats', 'Office', 'Cabinets'], dtype=object)[rng.integers(0, 5, num_products)],
+        'Rating': np.round(rng.uniform(3.5, 5.0, num_products), 1),
+        'Discount': np.array(['0%', '5%', '10%', '15%', '30%'], dtype=object)[rng.choice(5, num_products, p=[0.5, 0.2, 0.15, 0.1, 0.05])],
+        'Stock': rng.integers(0, 500, num_products),
+        'isSponsored': rng.random(num_products) < 0.1,
+    })
+
+
+def generate_orders(products: pd.DataFrame, num_orders: int = 1000, num_users: int = 100, seed: int = 42,
+                    days: int = 365, end_date: Optional[datetime] = None, popularity_exponent: float = 1.1,
+                    user_activity_exponent: float = 0.8, repeat_rate: float = 0.3,
+                    seasonality: float = 0.3) -> pd.DataFrame:
+    """Order history with skewed product popularity, repeat buyers and seasonality.
+
+    - Product choice follows a Zipf distribution over a random ranking of the catalog.
+    - User activity is Zipf-skewed too, so a few trade buyers place most orders.
+    - With probability repeat_rate an order re-buys the user's favourite product.
+    - Order days follow an annual sine cycle plus a weekday bump.
+    """
+    if products.empty or num_orders <= 0:
+        return pd.DataFrame()
+    rng = np.random.default_rng(seed)
+    num_products = len(products)
+
+    product_weights = _zipf_weights(rng, num_products, popularity_exponent)
+    user_weights = _zipf_weights(rng, num_users, user_activity_exponent)
+    users = rng.choice(num_users, size=num_orders, p=user_weights)
+    product_pos = rng.choice(num_products, size=num_orders, p=product_weights)
+
+    favourites = rng.choice(num_products, size=num_users, p=product_weights)
+    repeat = rng.random(num_orders) < repeat_rate
+    product_pos[repeat] = favourites[users[repeat]]
+
+    end_date = (end_date or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = end_date - timedelta(days=days)
+    day_numbers = np.arange(days + 1)
+    weekdays = (start_date.weekday() + day_numbers) % 7
+    day_weights = (1 + seasonality * np.sin(2 * np.pi * day_numbers / 365.0)) * np.where(weekdays < 5, 1.15, 0.85)
+    order_days = np.sort(rng.choice(days + 1, size=num_orders, p=day_weights / day_weights.sum()))
+    date_strings = np.array([(start_date + timedelta(days=int(d))).strftime("%Y-%m-%d") for d in day_numbers], dtype=object)
+
+    category = products['Category'].astype(str).to_numpy(dtype=object)[product_pos]
+    bulk = np.isin(category, BULK_CATEGORIES)
+    quantity = np.where(bulk, rng.integers(1, 11, num_orders), rng.integers(1, 4, num_orders))
+    price = products['Price'].to_numpy(dtype=np.float64)[product_pos]
+
+    rating = RATING_VALUES[rng.integers(0, len(RATING_VALUES), num_orders)]
+    rating[rng.random(num_orders) >= 0.7] = np.nan
+
+    user_strings = np.array([str(u) for u in range(1, num_users + 1)], dtype=object)
+    return pd.DataFrame({
+        'order_id': np.array([f"ORD_{i}" for i in range(1, num_orders + 1)], dtype=object),
+        'user_id': user_strings[users],
+        'product_id': products['ID'].to_numpy()[product_pos],
+        'product_name': products['Product Name'].to_numpy(dtype=object)[product_pos],
+        'category': category,
+        'sub_category': products['Sub-Category'].astype(str).to_numpy(dtype=object)[product_pos],
+        'brand': products['Brand'].astype(str).to_numpy(dtype=object)[product_pos],
+        'quantity': quantity,
+        'price_per_unit': price,
+        'total_amount': price * quantity,
+        'order_date': date_strings[order_days],
+        'rating': rating,
+    })
+
+
+def write_frame(frame: pd.DataFrame, path: str):
+    if path.endswith('.parquet'):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic catalog and order history")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--out-dir", default="data/synthetic")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="parquet")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    catalog = generate_catalog(args.products, seed=args.seed)
+    orders = generate_orders(ProductCatalog(catalog).frame, args.orders, args.users, seed=args.seed, days=args.days)
+
+    catalog_path = os.path.join(args.out_dir, f"products.{args.format}")
+    orders_path = os.path.join(args.out_dir, f"orders.{args.format}")
+    write_frame(catalog, catalog_path)
+    if args.format != "csv":
+        # The RAG loader reads CSV, so keep a CSV copy of the catalog as well
+        catalog.to_csv(os.path.join(args.out_dir, "products.csv"), index=False)
+    write_frame(orders, orders_path)
+    print(f"Wrote {len(catalog)} products to {catalog_path} and {len(orders)} orders to {orders_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,51 @@
 import pandas as pd
 from langchain.text_splitter import CharacterTextSplitter
+from telemetry import span
 
 # Constants for chunk size and overlap
 CHUNK_SIZE = 500  # Adjust based on your requirement
 CHUNK_OVERLAP = 50  # Adjust based on your requirement
 
+def _row_text(row, columns) -> str:
+    product = {col: row.get(col, "") for col in columns}  # Include all columns dynamically
+    # Convert product dictionary to string for chunking
+    return " | ".join(f"{key}: {value}" for key, value in product.items())
+
+def load_rows_by_column(filepath: str, key_column: str):
+    """One document per row, with the row's key_column value as its shard key"""
+    with span("csv_load"):
+        df = pd.read_csv(filepath)
+    if key_column not in df.columns:
+        raise ValueError(f"The CSV file must contain a '{key_column}' column to shard by it.")
+    with span("chunking"):
+        texts = [_row_text(row, df.columns) for _, row in df.iterrows()]
+        keys = df[key_column].fillna("").astype(str).tolist()
+    return texts, keys
+
+def split_rows(df: pd.DataFrame):
+    """Chunk a frame of rows: rows are joined into one document and split with overlap"""
+    with span("chunking"):
+        # Ensure all columns are present and in correct format
+        rows_as_text = []
+
+        # Check if 'id' exists in the CSV columns
+        if 'ID' not in df.columns:
+            raise ValueError("The CSV file must contain an 'id' column.")
+
+        # Convert each row into a dictionary with column names as keys
+        for index, row in df.iterrows():
+            rows_as_text.append(_row_text(row, df.columns))
+
+        # Join all rows into a large document, then split into chunks
+        joined_text = "\n".join(rows_as_text)
+
+        # Rows are separated by single newlines; the default "\n\n" separator would leave one chunk per frame
+        splitter = CharacterTextSplitter(separator="\n", chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        return splitter.split_text(joined_text)
+
 def load_and_split_csv(filepath: str):
     # Read the CSV file
-    df = pd.read_csv(filepath)
-
-    # Ensure all columns are present and in correct format
-    rows_as_text = []
-
-    # Check if 'id' exists in the CSV columns
-    if 'ID' not in df.columns:
-        raise ValueError("The CSV file must contain an 'id' column.")
-
-    # Convert each row into a dictionary with column names as keys
-    for index, row in df.iterrows():
-        product = {col: row.get(col, "") for col in df.columns}  # Include all columns dynamically
-        # Convert product dictionary to string for chunking
-        product_text = " | ".join(f"{key}: {value}" for key, value in product.items())
-        rows_as_text.append(product_text)
-
-    # Join all rows into a large document, then split into chunks
-    joined_text = "\n".join(rows_as_text)
-
-    splitter = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-    chunks = splitter.split_text(joined_text)
-
-    return chunks
+    with span("csv_load"):
+        df = pd.read_csv(filepath)
 
+    return split_rows(df)
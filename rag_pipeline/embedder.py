@@ -1,9 +1,11 @@
 from sentence_transformers import SentenceTransformer
 from config import EMBEDDING_MODEL
+from telemetry import span
 
 class Embedder:
     def __init__(self):
         self.model = SentenceTransformer(EMBEDDING_MODEL)
 
     def embed(self, texts: list[str]):
-        return self.model.encode(texts)
+        with span("embedding"):
+            return self.model.encode(texts)
@@ -3,6 +3,7 @@ from config import OPENAI_API_KEY
 import json
 from pydantic import BaseModel
 from typing import List, Optional
+from telemetry import span, record_llm_usage
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
@@ -26,8 +27,32 @@ class Product(BaseModel):
     stock: bool
     isSponsored: bool
 
-def generate_answer(context: str, query: str) -> str:
-    prompt = f"""
+# Product CSV columns each output field is extracted from. The context builder
+# never prunes these from the prompt, so keep this in step with the schema above.
+SCHEMA_SOURCE_COLUMNS = {
+    "ID": ["ID"],
+    "name": ["Product Name"],
+    "type": ["Category", "Sub-Category"],
+    "properties": ["Category", "Sub-Category", "Material", "Size", "Waterproof", "Termite-Proof", "Fire-Rated",
+                   "Usage"],
+    "wood_type": ["Material"],
+    "thickness": ["Thickness"],
+    "dimensions": ["Size"],
+    "color": ["Color"],
+    "price": ["Price"],
+    "brand": ["Brand"],
+    "eco_friendly": ["Waterproof", "Termite-Proof", "Fire-Rated"],
+    "fire_resistant": ["Fire-Rated"],
+    "termite_resistant": ["Termite-Proof"],
+    "recommended_for": ["Usage"],
+    "rating": ["Rating"],
+    "discount": ["Discount"],
+    "stock": ["Stock"],
+    "isSponsored": ["isSponsored"],
+}
+
+def build_prompt(context: str, query: str) -> str:
+    return f"""
 You are a structured information extractor.
 
 Maintain consistent data types for each field.
@@ -89,15 +114,22 @@ Context:
 Question: {query}
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}]
-    )
+def generate_answer(context: str, query: str) -> str:
+    with span("prompt_build"):
+        prompt = build_prompt(context, query)
+
+    with span("llm_call"):
+        response = client.chat.completions.create(
+            model="gpt-4",
+            messages=[{"role": "user", "content": prompt}]
+        )
+    record_llm_usage("product_query", response)
 
     raw_text = response.choices[0].message.content.strip()
 
     try:
-        parsed = json.loads(raw_text)
+        with span("json_parse"):
+            parsed = json.loads(raw_text)
         return json.dumps(parsed, indent=2)
     except json.JSONDecodeError:
         return json.dumps({"error": "Could not parse JSON", "raw_response": raw_text}, indent=2)
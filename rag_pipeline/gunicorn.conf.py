@@ -0,0 +1,38 @@
+"""Multi-process serving for main.py.
+
+    gunicorn -c rag_pipeline/gunicorn.conf.py main:app    (from the repository root)
+
+The app is imported once in the master (preload_app), so the catalog, order
+history, embedding model and FAISS index are built a single time and shared
+with the forked workers copy-on-write. Mutable state goes through the SQLite
+state store so every worker sees the same sessions and ingested orders.
+"""
+import gc
+import os
+
+# Must be set before the app is imported
+os.environ.setdefault("STATE_STORE", "sqlite:///data/state.db")
+# One compute thread per worker: scale with processes, and keep OpenMP pools out of the pre-fork
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+# No collections in the master while the app loads, so loaded objects aren't
+# moved between generations (and their pages dirtied) after the fork
+gc.disable()
+
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+bind = os.getenv("BIND", "0.0.0.0:8081")
+workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+keepalive = 5
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far into the permanent generation: the workers'
+    # collector will never touch (and so never copy) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
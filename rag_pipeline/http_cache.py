@@ -0,0 +1,66 @@
+"""Versioned response caching: ETags, conditional requests and a server-side cache.
+
+An ETag is a digest of the endpoint, its parameters and the versions of the
+data the response is computed from (catalog version, order log position,
+per-user order version). The same tag keys the server-side cache, so a cached
+body is never served after any of those versions moves on.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from fastapi.responses import Response
+
+from config import RESPONSE_CACHE_SIZE
+from telemetry import registry
+
+CACHE_REQUESTS = registry.counter("shopwhisper_response_cache_total", "Response cache lookups, by endpoint and result")
+
+
+def make_etag(endpoint: str, *parts: Any) -> str:
+    """Strong ETag for a response determined by endpoint and parts"""
+    digest = hashlib.sha1(repr((endpoint,) + parts).encode("utf-8")).hexdigest()[:24]
+    return f'"{endpoint}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value names etag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str, headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **headers})
+
+
+class ResponseCache:
+    """LRU of encoded response bodies keyed by ETag"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str, endpoint: str = "") -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is not None:
+                self._entries.move_to_end(etag)
+        CACHE_REQUESTS.inc(endpoint=endpoint, result="hit" if body is not None else "miss")
+        return body
+
+    def put(self, etag: str, body: bytes):
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,243 @@
+"""Streaming, resumable build of the retrieval index for a large documents CSV.
+
+Usage:
+    python ingest_catalog.py data/products.csv --output data/index/products --workers 4
+    python ingest_catalog.py data/products.csv --output data/index/products --resume
+
+The CSV is read INGEST_BLOCK_ROWS rows at a time; each block is chunked and
+embedded in INGEST_BATCH_SIZE batches on a pool of worker processes, and the
+vectors and chunk texts are appended to files in <output>.partial as they
+arrive. Apart from the final index, memory is bounded by one block plus the
+batches in flight. A checkpoint is written after every block, so --resume
+continues an interrupted run from the last completed block. The finished
+directory is what VectorStore.load() reads; point PDF_PATH at it to serve it.
+
+Chunks never span two blocks, so the chunks can differ slightly from
+load_and_split_csv() over the whole file near block boundaries.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Deque, Dict, List, Optional
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from config import INGEST_BLOCK_ROWS, INGEST_BATCH_SIZE
+from document_loader import split_rows
+from embedder import Embedder
+from vector_store import INDEX_FILE, DOCUMENTS_FILE
+
+CHECKPOINT_FILE = "checkpoint.json"
+VECTORS_FILE = "vectors.f32"
+CHUNKS_FILE = "chunks.jsonl"
+
+# Per-process embedder, built once by the pool initializer
+_worker_embedder: Optional[Embedder] = None
+
+
+def _init_worker():
+    global _worker_embedder
+    _worker_embedder = Embedder()
+
+
+def _embed_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_embedder.embed(texts), dtype=np.float32)
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak resident set of this process, or with RUSAGE_CHILDREN of its largest finished worker (Linux reports KiB)"""
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def _source_signature(path: str) -> Dict[str, Any]:
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+class _Checkpoint:
+    """Progress of one ingest: rows consumed, and the byte lengths of the vector and chunk files at that point"""
+
+    def __init__(self, work_dir: str, signature: Dict[str, Any], block_rows: int):
+        self.path = os.path.join(work_dir, CHECKPOINT_FILE)
+        self.signature = signature
+        self.block_rows = block_rows
+        self.rows = 0
+        self.chunks = 0
+        self.dimension: Optional[int] = None
+        self.vectors_bytes = 0
+        self.chunks_bytes = 0
+
+    def load(self) -> bool:
+        """Restore progress if the checkpoint belongs to the same source file and block size"""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if saved.get("signature") != self.signature or saved.get("block_rows") != self.block_rows:
+            return False
+        self.rows = saved["rows"]
+        self.chunks = saved["chunks"]
+        self.dimension = saved["dimension"]
+        self.vectors_bytes = saved["vectors_bytes"]
+        self.chunks_bytes = saved["chunks_bytes"]
+        return True
+
+    def save(self):
+        partial = self.path + ".tmp"
+        with open(partial, "w") as f:
+            json.dump({
+                "signature": self.signature, "block_rows": self.block_rows, "rows": self.rows,
+                "chunks": self.chunks, "dimension": self.dimension,
+                "vectors_bytes": self.vectors_bytes, "chunks_bytes": self.chunks_bytes
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(partial, self.path)
+
+
+def _finalize(work_dir: str, output: str, checkpoint: _Checkpoint, batch_rows: int):
+    """Build the FAISS index from the appended vectors and swap the finished directory into place"""
+    staging = output + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    index = faiss.IndexFlatL2(checkpoint.dimension)
+    if checkpoint.chunks:
+        vectors = np.memmap(os.path.join(work_dir, VECTORS_FILE), dtype=np.float32, mode="r",
+                            shape=(checkpoint.chunks, checkpoint.dimension))
+        for start in range(0, checkpoint.chunks, batch_rows):
+            index.add(np.ascontiguousarray(vectors[start:start + batch_rows]))
+        del vectors
+    faiss.write_index(index, os.path.join(staging, INDEX_FILE))
+    del index
+
+    # documents.json is written line by line from the chunk log, never as one list
+    with open(os.path.join(work_dir, CHUNKS_FILE)) as chunks, \
+            open(os.path.join(staging, DOCUMENTS_FILE), "w") as documents:
+        documents.write("[")
+        for position, line in enumerate(chunks):
+            documents.write(("," if position else "") + line.rstrip("\n"))
+        documents.write("]")
+
+    if os.path.exists(output):
+        retired = f"{output}.old.{os.getpid()}"
+        os.rename(output, retired)
+        os.rename(staging, output)
+        shutil.rmtree(retired, ignore_errors=True)
+    else:
+        os.rename(staging, output)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run(documents_path: str, output: str, workers: int = 1, block_rows: int = INGEST_BLOCK_ROWS,
+        batch_size: int = INGEST_BATCH_SIZE, resume: bool = False) -> Dict[str, Any]:
+    """Embed documents_path into a saved index at output; returns throughput and peak memory"""
+    work_dir = output + ".partial"
+    checkpoint = _Checkpoint(work_dir, _source_signature(documents_path), block_rows)
+    if resume and checkpoint.load():
+        print(f"Resuming after {checkpoint.rows} rows ({checkpoint.chunks} chunks)")
+    else:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    os.makedirs(work_dir, exist_ok=True)
+
+    vectors_file = open(os.path.join(work_dir, VECTORS_FILE), "ab")
+    chunks_file = open(os.path.join(work_dir, CHUNKS_FILE), "ab")
+    # Drop anything written after the last checkpoint by an interrupted run
+    vectors_file.truncate(checkpoint.vectors_bytes)
+    chunks_file.truncate(checkpoint.chunks_bytes)
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    if pool is None:
+        _init_worker()
+    max_in_flight = max(workers, 1) * 2
+    resumed_rows = checkpoint.rows
+    start = time.perf_counter()
+
+    def write(texts: List[str], embeddings: np.ndarray):
+        if checkpoint.dimension is None:
+            checkpoint.dimension = int(embeddings.shape[1])
+        vectors_file.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+        chunks_file.write("".join(json.dumps(text) + "\n" for text in texts).encode("utf-8"))
+        checkpoint.chunks += len(texts)
+
+    try:
+        blocks = pd.read_csv(documents_path, chunksize=block_rows,
+                             skiprows=range(1, checkpoint.rows + 1) if checkpoint.rows else None)
+        for block in blocks:
+            chunks = split_rows(block)
+            # Batches are written in submission order, so the index order is the same on every run
+            in_flight: Deque[tuple] = deque()
+            for batch_start in range(0, len(chunks), batch_size):
+                texts = chunks[batch_start:batch_start + batch_size]
+                if pool is None:
+                    write(texts, _embed_batch(texts))
+                    continue
+                in_flight.append((texts, pool.submit(_embed_batch, texts)))
+                if len(in_flight) >= max_in_flight:
+                    done_texts, future = in_flight.popleft()
+                    write(done_texts, future.result())
+            while in_flight:
+                done_texts, future = in_flight.popleft()
+                write(done_texts, future.result())
+
+            vectors_file.flush()
+            chunks_file.flush()
+            os.fsync(vectors_file.fileno())
+            os.fsync(chunks_file.fileno())
+            checkpoint.rows += len(block)
+            checkpoint.vectors_bytes = vectors_file.tell()
+            checkpoint.chunks_bytes = chunks_file.tell()
+            checkpoint.save()
+
+            elapsed = time.perf_counter() - start
+            rows_per_second = (checkpoint.rows - resumed_rows) / elapsed if elapsed > 0 else 0.0
+            print(f"{checkpoint.rows} rows, {checkpoint.chunks} chunks, {rows_per_second:.1f} rows/sec, "
+                  f"peak RSS {peak_rss_mb()} MB")
+    finally:
+        vectors_file.close()
+        chunks_file.close()
+        if pool is not None:
+            pool.shutdown()
+
+    if checkpoint.dimension is None:
+        raise ValueError(f"No documents to index in {documents_path}")
+    _finalize(work_dir, output, checkpoint, batch_size * 64)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "rows": checkpoint.rows,
+        "rows_this_run": checkpoint.rows - resumed_rows,
+        "chunks": checkpoint.chunks,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round((checkpoint.rows - resumed_rows) / elapsed, 1) if elapsed > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_worker_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if workers > 1 else None
+    }
+    print(f"Indexed {checkpoint.rows} rows as {checkpoint.chunks} chunks into {output} in {elapsed:.2f}s "
+          f"({stats['rows_per_second']} rows/sec, peak RSS {stats['peak_rss_mb']} MB, {workers} workers)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a documents CSV into a saved retrieval index")
+    parser.add_argument("documents_path")
+    parser.add_argument("--output", required=True, help="index directory to write")
+    parser.add_argument("--workers", type=int, default=1, help="embedding processes")
+    parser.add_argument("--block-rows", type=int, default=INGEST_BLOCK_ROWS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    args = parser.parse_args()
+    run(args.documents_path, args.output, args.workers, args.block_rows, args.batch_size, args.resume)
+
+
+if __name__ == "__main__":
+    main()
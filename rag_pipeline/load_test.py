@@ -0,0 +1,220 @@
+"""Open-loop HTTP load test for the ShopWhisper services.
+
+Requests are sent on a Poisson arrival schedule regardless of how fast earlier
+requests complete, and latency is measured from the scheduled send time, so a
+slow server shows up as queueing delay instead of silently lowering the load.
+
+Typical run, with the LLM replaced by mock_openai.py:
+    python mock_openai.py --port 8099 --latency-dist lognormal --latency-ms 800 --latency-spread 0.4 &
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python main.py &
+    python load_test.py --endpoints popular-products:50,recommendations:10 --duration 60 \
+        --output results/$(git rev-parse --short HEAD).json
+    python load_test.py ... --compare results/<previous>.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+SERVICES = {
+    "rag": "http://127.0.0.1:8081",             # rag_pipeline/main.py
+    "recommendation": "http://127.0.0.1:8000",  # recommendation/main-1.py
+    "models": "http://127.0.0.1:8080",          # Models/main.py
+}
+
+QUESTIONS = [
+    "Show me waterproof plywood for bathrooms",
+    "Which laminates are available in white?",
+    "Cheap hardware handles for kitchen cabinets",
+    "Termite-proof plywood under 2000",
+]
+KEYWORDS = [["plywood"], ["plywood", "oak"], ["laminate"], ["handles"], ["adhesive"], ["teak", "veneer"]]
+
+# name -> (service, method, path)
+ENDPOINTS = {
+    "load-fliter": ("rag", "POST", "/product/load-fliter"),
+    "recommendations": ("rag", "GET", "/user/recommendations"),
+    "behavior": ("rag", "GET", "/api/user/behavior"),
+    "popular-products": ("rag", "GET", "/popular-products"),
+    "recommendations-v1": ("recommendation", "GET", "/user/recommendations"),
+    "popular-products-v1": ("recommendation", "GET", "/popular-products"),
+    "search": ("models", "GET", "/search"),
+}
+
+
+def build_request(name: str, rng: random.Random, num_users: int) -> Dict[str, Any]:
+    service, method, path = ENDPOINTS[name]
+    user_id = str(rng.randint(1, num_users))
+    request: Dict[str, Any] = {"method": method, "url": SERVICES[service] + path, "headers": {}}
+    if name == "load-fliter":
+        request["headers"]["user-id"] = user_id
+        request["json"] = {"question": rng.choice(QUESTIONS)}
+    elif name in ("recommendations", "behavior", "recommendations-v1"):
+        request["headers"]["user-id"] = user_id
+    elif name in ("popular-products", "popular-products-v1"):
+        request["params"] = {"num_products": 5}
+    elif name == "search":
+        request["params"] = [("keyword", keyword) for keyword in rng.choice(KEYWORDS)]
+    return request
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 2)
+
+
+def summarize(samples: List[Dict[str, Any]], duration: float, rate: float) -> Dict[str, Any]:
+    latencies = sorted(sample["latency_ms"] for sample in samples if sample["ok"])
+    errors = [sample for sample in samples if not sample["ok"]]
+    status_counts: Dict[str, int] = {}
+    for sample in samples:
+        status_counts[str(sample["status"])] = status_counts.get(str(sample["status"]), 0) + 1
+    return {
+        "target_rate": rate,
+        "requests": len(samples),
+        "ok": len(latencies),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(latencies) / duration, 2) if duration > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies), 2) if latencies else None,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": round(latencies[-1], 2) if latencies else None,
+        },
+        "status_counts": status_counts,
+    }
+
+
+async def run_endpoint(client: httpx.AsyncClient, name: str, rate: float, duration: float,
+                       num_users: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(f"{seed}:{name}")
+    samples: List[Dict[str, Any]] = []
+    tasks = []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    async def fire(scheduled: float, request: Dict[str, Any]):
+        try:
+            response = await client.request(**request)
+            status = response.status_code
+            ok = 200 <= status < 400
+        except httpx.HTTPError as e:
+            status, ok = type(e).__name__, False
+        samples.append({"latency_ms": (loop.time() - scheduled) * 1000, "status": status, "ok": ok})
+
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(rate)
+        if offset >= duration:
+            break
+        scheduled = start + offset
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(scheduled, build_request(name, rng, num_users))))
+
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    return summarize(samples, elapsed, rate)
+
+
+async def run(endpoint_rates: Dict[str, float], duration: float, num_users: int, seed: int,
+              timeout: float) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=512)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        results = await asyncio.gather(*[
+            run_endpoint(client, name, rate, duration, num_users, seed)
+            for name, rate in endpoint_rates.items()
+        ])
+    return dict(zip(endpoint_rates, results))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    header = f"{'endpoint':22s} {'rps':>8s} {'err%':>6s} {'p50':>9s} {'p95':>9s} {'p99':>9s}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        line = (f"{name:22s} {result['throughput_rps']:8.1f} {result['error_rate'] * 100:6.2f} "
+                f"{latency['p50'] or 0:9.1f} {latency['p95'] or 0:9.1f} {latency['p99'] or 0:9.1f}")
+        previous = (baseline or {}).get(name)
+        if previous and previous["latency_ms"]["p99"] and latency["p99"]:
+            change = (latency["p99"] - previous["latency_ms"]["p99"]) / previous["latency_ms"]["p99"] * 100
+            line += f"   p99 {change:+.1f}% vs baseline"
+        print(line)
+
+
+def parse_endpoint_rates(value: str) -> Dict[str, float]:
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition(":")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint {name!r}; choose from {', '.join(ENDPOINTS)}")
+        rates[name] = float(rate or 1.0)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the ShopWhisper HTTP services")
+    parser.add_argument("--endpoints", default="popular-products:20,recommendations:5",
+                        help="comma-separated name:requests_per_second pairs")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load per endpoint")
+    parser.add_argument("--users", type=int, default=100, help="user IDs are drawn from 1..N")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--rag-url", default=SERVICES["rag"])
+    parser.add_argument("--recommendation-url", default=SERVICES["recommendation"])
+    parser.add_argument("--models-url", default=SERVICES["models"])
+    parser.add_argument("--output", default=None, help="write machine-readable results as JSON")
+    parser.add_argument("--compare", default=None, help="previous results JSON to compare p99 against")
+    args = parser.parse_args()
+
+    SERVICES.update(rag=args.rag_url, recommendation=args.recommendation_url, models=args.models_url)
+    endpoint_rates = parse_endpoint_rates(args.endpoints)
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    results = asyncio.run(run(endpoint_rates, args.duration, args.users, args.seed, args.timeout))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f).get("results")
+    print_report(results, baseline)
+
+    if args.output:
+        report = {
+            "started_at": started_at,
+            "commit": git_commit(),
+            "config": {
+                "endpoints": endpoint_rates,
+                "duration": args.duration,
+                "users": args.users,
+                "seed": args.seed,
+                "services": SERVICES,
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,147 @@
-from document_loader import load_and_split_csv
-from retriever import Retriever
 from generator import generate_answer
 from pydantic import BaseModel
-from fastapi import FastAPI, HTTPException, Header
-from typing import List, Dict, Any, Optional
+from fastapi import FastAPI, HTTPException, Header, Request, Depends, Query
+from typing import List, Any, Optional
 import uvicorn
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
 import json
 from recommendation_system import RecommendationSystem
-import pandas as pd
-import numpy as np
 from config import PDF_PATH
 import openai
-from config import FALL_BACK_DATA
+from config import RECOMMENDATION_STORE_PATH, RECOMMENDATION_MAX_AGE_SECONDS
+from recommendation_store import RecommendationStore
+from datetime import datetime, timezone
+import os
+import time
+from config import STATE_STORE, INDEX_DIR, SESSION_TTL_SECONDS, ADMIN_TOKEN
+from state_store import create_state_store
+from catalog_snapshot import CatalogManager
+from admission import AdmissionController, RateLimiter
+import math
+import hmac
+from serialization import FastJSONResponse, dumps
+from http_cache import ResponseCache, make_etag, etag_matches, not_modified
+from config import POPULAR_PRODUCTS_CACHE_CONTROL, RECOMMENDATIONS_CACHE_CONTROL, MAX_POPULAR_RESULTS
+from config import CONTEXT_CANDIDATES
+from context_builder import build_context
+import telemetry
+from telemetry import span
+import profiling
+from profiling import run_in_threadpool
 
-app = FastAPI()
+telemetry.configure_logging()
+
+app = FastAPI(default_response_class=FastJSONResponse)
+telemetry.install(app)
+profiling.install(app)
+
+# Sessions, caches and ingested orders; shared between worker processes when STATE_STORE is sqlite
+state = create_state_store(STATE_STORE)
+
+# Versioned catalog + retrieval index, rebuilt in the background when the files change.
+# Under a pre-fork server the first snapshot is built in the master and shared
+# copy-on-write by the workers.
+catalog_manager = CatalogManager("data/products.csv", documents_path=PDF_PATH, index_dir=INDEX_DIR, state=state)
 
 # Initialize recommendation system
-recommendation_system = RecommendationSystem(data_path="data/products.csv")
+recommendation_system = RecommendationSystem(
+    data_path="data/products.csv", state=state, catalog=catalog_manager.current.catalog
+)
+catalog_manager.on_swap(lambda snapshot: recommendation_system.set_catalog(snapshot.catalog))
+
+# Serve precomputed recommendations when the batch job has produced a store
+recommendation_store = RecommendationStore(RECOMMENDATION_STORE_PATH) if os.path.exists(RECOMMENDATION_STORE_PATH) else None
+
+# Bounded, prioritized access to the LLM; over capacity, endpoints degrade to local answers
+admission = AdmissionController()
+rate_limiter = RateLimiter()
+
+# Encoded responses keyed by their ETag, which changes with the catalog and order versions
+response_cache = ResponseCache()
+
+# Sized on demand by /admin/memory; getters are re-evaluated so catalog swaps are followed
+profiling.register_component("catalog", lambda: catalog_manager.current.catalog)
+profiling.register_component("retrieval_index", lambda: getattr(catalog_manager.current.retriever, "store", None))
+profiling.register_component("order_history", lambda: recommendation_system.orders)
+profiling.register_component("trending", lambda: recommendation_system.trending)
+profiling.register_component("state_store", lambda: state)
+profiling.register_component("rate_limiter", lambda: rate_limiter)
+profiling.register_component("response_cache", lambda: response_cache)
+
+def check_rate_limit(user_id: str, endpoint_class: str):
+    allowed, retry_after = rate_limiter.allow(str(user_id), endpoint_class)
+    if not allowed:
+        raise HTTPException(status_code=429, detail="Too many requests",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.on_event("startup")
+def start_catalog_watcher():
+    # Runs in each worker, after the fork
+    catalog_manager.start()
 
-# In-memory session store
-sessions = {}
+def touch_session(user_id: str):
+    session = state.get("sessions", user_id) or {"started_at": time.time(), "questions": 0}
+    session["questions"] += 1
+    session["last_seen"] = time.time()
+    state.set("sessions", user_id, session, ttl=SESSION_TTL_SECONDS)
 
 class QueryRequest(BaseModel):
     question: str
+    # Searches only these categories' shards when the index is sharded by category
+    categories: Optional[List[str]] = None
 
 @app.post("/product/load-fliter")
-def query_handler(request: QueryRequest, user_id: str = Header(..., alias="user-id")):
+async def query_handler(request: QueryRequest, user_id: str = Header(..., alias="user-id")):
     # try:
         if request.question.lower() == "exit":
             return {"message": "Use /session/end to end the session."}
 
-        chunks = load_and_split_csv(PDF_PATH)
+        check_rate_limit(user_id, "search")
+        await run_in_threadpool(touch_session, user_id)
+        # Hold on to one snapshot for the whole request; a reload swaps in a new one for later requests
+        retriever = catalog_manager.current.retriever
+        if retriever is None:
+            raise HTTPException(status_code=503, detail="Product documents are not loaded.")
+        query_vector, hits = await run_in_threadpool(
+            retriever.get_candidates, request.question, CONTEXT_CANDIDATES, request.categories
+        )
+        # Deduped, diversity-ordered product rows with irrelevant columns dropped, packed to the token budget
+        relevant_chunks = await run_in_threadpool(build_context, request.question, query_vector, hits)
+        context = "\n".join(relevant_chunks)
 
-        if user_id not in sessions:
-            sessions[user_id] = Retriever(chunks)
-
-        retriever = sessions[user_id]
-        relevant_chunks = retriever.get_relevant_chunks(request.question)
-        context = "\n\n".join(relevant_chunks)
-
-        try:
-            answer = generate_answer(context, request.question)
-        except openai.error.AuthenticationError:
-            raise HTTPException(status_code=401, detail="Invalid or expired OpenAI API key.")
-        except openai.error.OpenAIError as e:
-            raise HTTPException(status_code=502, detail=f"OpenAI API error: {str(e)}")
+        async with admission.slot("search") as admitted:
+            if not admitted:
+                # Over capacity: return the retrieved product rows without the LLM extraction
+                with span("serialization"):
+                    return FastJSONResponse(content={
+                        "user_id": user_id,
+                        "question": request.question,
+                        "answer": {"retrieved_chunks": relevant_chunks}
+                    }, headers={"X-Degraded": "retrieval-only"})
+            try:
+                answer = await run_in_threadpool(generate_answer, context, request.question)
+            except openai.AuthenticationError:
+                raise HTTPException(status_code=401, detail="Invalid or expired OpenAI API key.")
+            except openai.OpenAIError as e:
+                raise HTTPException(status_code=502, detail=f"OpenAI API error: {str(e)}")
 
         try:
             parsed_answer = json.loads(answer)
         except json.JSONDecodeError:
             parsed_answer = {"raw_answer": answer}
 
-        return JSONResponse(content={
-            "user_id": user_id,
-            "question": request.question,
-            "answer": parsed_answer
-        })
+        with span("serialization"):
+            return FastJSONResponse(content={
+                "user_id": user_id,
+                "question": request.question,
+                "answer": parsed_answer
+            })
 
     # except HTTPException as http_ex:
     #     # Let FastAPI handle known HTTP exceptions
@@ -74,72 +159,246 @@ def query_handler(request: QueryRequest, user_id: str = Header(..., alias="user-
     #             "error": f"Critical failure: {str(e)} | Fallback also failed: {fallback_error}"
     #         })
 
-def convert_numpy_types(obj):
-    if isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, dict):
-        return {key: convert_numpy_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(item) for item in obj]
-    return obj
+@app.post("/session/end")
+def end_session(user_id: str = Header(..., alias="user-id")):
+    state.delete("sessions", user_id)
+    return {"message": "Session ended."}
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Product Recommendation API"}
 
+@app.post("/admin/catalog/reload", status_code=202, dependencies=[Depends(require_admin)])
+async def reload_catalog():
+    """Rebuild the catalog and retrieval index in the background, then swap them in"""
+    generation = catalog_manager.request_reload()
+    return {"reload_generation": generation, **catalog_manager.status()}
+
+@app.get("/admin/catalog", dependencies=[Depends(require_admin)])
+async def catalog_status():
+    return catalog_manager.status()
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin)])
+async def memory_status(top: int = 20):
+    """RSS, approximate size of each serving component and, with TRACEMALLOC_FRAMES set, top allocation sites"""
+    return await run_in_threadpool(profiling.memory_report, top)
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Saved request profiles, newest first; with PROFILE_HEADER set, profile a request by sending it with the admin token"""
+    return profiling.list_profiles()
+
+@app.get("/admin/profiles/{name}", dependencies=[Depends(require_admin)])
+async def get_profile(name: str):
+    """Folded stacks for flamegraph.pl or speedscope"""
+    folded = profiling.read_profile(name)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(folded)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus-format stage latencies, request latencies and LLM token counts"""
+    return PlainTextResponse(telemetry.render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/user/behavior")
 async def get_user_behavior(user_id: Optional[str] = Header(None)):
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID is required")
+    check_rate_limit(user_id, "behavior")
     
     try:
         # Clean user_id to ensure it's just the number
         user_id = str(user_id).replace('USER_', '')
         
-        # Get recommended products based on behavior
-        recommendations = recommendation_system.get_recommendations(user_id, num_recommendations=5)
+        # Get recommended products based on behavior; local scoring only when the LLM is saturated
+        headers = {}
+        async with admission.slot("behavior") as admitted:
+            if admitted:
+                recommendations, degraded = await run_in_threadpool(
+                    recommendation_system.get_recommendations_with_status, user_id, 5
+                )
+                if degraded:
+                    headers["X-Degraded"] = "llm-error"
+            else:
+                headers["X-Degraded"] = "local"
+                recommendations = await run_in_threadpool(
+                    recommendation_system.get_local_recommendations, user_id, num_recommendations=5
+                )
         
-        # Convert NumPy types and ensure reasons is a list
-        converted_recommendations = convert_numpy_types(recommendations)
-        for rec in converted_recommendations:
-            if isinstance(rec.get('reasons'), str):
-                rec['reasons'] = [rec['reasons']]
-            elif not isinstance(rec.get('reasons'), list):
-                rec['reasons'] = []
-        
-        return {
-            "recommended_products": converted_recommendations
-        }
+        # reasons are already lists in both recommendation paths; orjson handles the NumPy values
+        with span("serialization"):
+            return FastJSONResponse({"recommended_products": recommendations}, headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/user/recommendations", response_model=List[Dict[str, Any]])
+@app.get("/user/recommendations")
 async def get_recommendations(
     user_id: Optional[str] = Header(None),
-    num_recommendations: int = 5
+    num_recommendations: int = 5,
+    if_none_match: Optional[str] = Header(None)
 ):
     """Get product recommendations for a user"""
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID is required in headers")
-        
+    cache_headers = {"Cache-Control": RECOMMENDATIONS_CACHE_CONTROL, "Vary": "user-id"}
+
+    # A user's recommendations only change with their orders or the catalog; the catalog's content
+    # fingerprint (not its per-process version) keeps the tag the same across workers and restarts
+    catalog_id = catalog_manager.current.content_id
+    user_version = await run_in_threadpool(recommendation_system.user_orders_version, user_id)
+
+    if recommendation_store is not None:
+        # A precomputed row is only used while the user's orders and the catalog are the ones it was computed from
+        cached = await run_in_threadpool(
+            recommendation_store.get_fresh, str(user_id).replace('USER_', ''), RECOMMENDATION_MAX_AGE_SECONDS,
+            user_version, catalog_id
+        )
+        if cached is not None:
+            recommendations, computed_at = cached
+            etag = make_etag("precomputed", str(user_id).replace('USER_', ''), computed_at, num_recommendations)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag, cache_headers)
+            with span("serialization"):
+                return FastJSONResponse(
+                    content=recommendations[:num_recommendations],
+                    headers={"X-Recommendations-Computed-At": datetime.fromtimestamp(computed_at, timezone.utc).isoformat(),
+                             "ETag": etag, **cache_headers}
+                )
+
+    etag = make_etag("recommendations", str(user_id).replace('USER_', ''), catalog_id, user_version,
+                     num_recommendations)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_headers)
+    body = response_cache.get(etag, "recommendations")
+    if body is not None:
+        return FastJSONResponse(body, headers={"ETag": etag, **cache_headers})
+
+    # Cold user: nothing fresh precomputed, compute live
+    check_rate_limit(user_id, "recommendations")
     try:
-        recommendations = recommendation_system.get_recommendations(user_id, num_recommendations)
-        return recommendations
+        degraded = None
+        async with admission.slot("recommendations") as admitted:
+            if admitted:
+                recommendations, llm_failed = await run_in_threadpool(
+                    recommendation_system.get_recommendations_with_status, user_id, num_recommendations
+                )
+                if llm_failed:
+                    degraded = "llm-error"
+            else:
+                degraded = "local"
+                recommendations = await run_in_threadpool(
+                    recommendation_system.get_local_recommendations, user_id, num_recommendations
+                )
+        with span("serialization"):
+            body = dumps(recommendations)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if degraded:
+        # A degraded answer is neither cached nor given a validator
+        return FastJSONResponse(body, headers={"X-Degraded": degraded, "Cache-Control": "no-store"})
+    response_cache.put(etag, body)
+    return FastJSONResponse(body, headers={"ETag": etag, **cache_headers})
 
-@app.get("/popular-products", response_model=List[Dict[str, Any]])
-async def get_popular_products(num_products: int = 5):
-    """Get popular products based on all users' order history"""
+def _parse_orders_body(body: bytes, json_lines: bool) -> List[Any]:
     try:
-        popular_products = recommendation_system.get_popular_products(num_products)
-        return popular_products
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        text = body.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Body must be UTF-8: {str(e)}")
+    try:
+        if json_lines:
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        payload = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+    return payload if isinstance(payload, list) else [payload]
+
+@app.post("/orders")
+async def ingest_orders(request: Request):
+    """Ingest a single order (JSON object) or a batch (JSON array or JSON lines)"""
+    json_lines = request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/jsonl"))
+    orders = _parse_orders_body(await request.body(), json_lines)
+    result = await run_in_threadpool(recommendation_system.ingest_orders, orders)
+    status_code = 201 if result["accepted"] else 400
+    return FastJSONResponse(status_code=status_code, content=result)
+
+@app.post("/orders/batch")
+async def ingest_orders_batch(request: Request):
+    """Ingest a batch of orders sent as JSON lines, one order per line"""
+    orders = _parse_orders_body(await request.body(), json_lines=True)
+    result = await run_in_threadpool(recommendation_system.ingest_orders, orders)
+    status_code = 201 if result["accepted"] else 400
+    return FastJSONResponse(status_code=status_code, content=result)
+
+@app.get("/popular-products")
+async def get_popular_products(
+    num_products: int = Query(5, ge=1, le=MAX_POPULAR_RESULTS),
+    mode: str = "all_time",
+    half_life_days: Optional[float] = None,
+    window_days: Optional[int] = None,
+    category: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Get popular products based on all users' order history.
+
+    mode: all_time | decayed (uses half_life_days) | window (uses window_days)
+    """
+    cache_headers = {"Cache-Control": POPULAR_PRODUCTS_CACHE_CONTROL}
+    # The answer is the same for every caller until the catalog or the order log moves on,
+    # and for the decayed and window modes, until the day changes
+    catalog_id = catalog_manager.current.content_id
+    orders_version = await run_in_threadpool(recommendation_system.orders_version)
+    day = recommendation_system.trending.current_day() if mode != "all_time" else None
+    etag = make_etag("popular", catalog_id, orders_version, day, num_products, mode, half_life_days, window_days,
+                     category)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_headers)
+    body = response_cache.get(etag, "popular")
+    if body is None:
+        try:
+            popular_products = recommendation_system.get_popular_products(
+                num_products, mode=mode, half_life_days=half_life_days, window_days=window_days, category=category
+            )
+            with span("serialization"):
+                body = dumps(popular_products)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        response_cache.put(etag, body)
+    return FastJSONResponse(body, headers={"ETag": etag, **cache_headers})
+
+@app.get("/popular-categories")
+async def get_popular_categories(
+    num_categories: int = Query(5, ge=1, le=MAX_POPULAR_RESULTS),
+    mode: str = "decayed",
+    half_life_days: Optional[float] = None,
+    window_days: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Trending categories from all users' order history.
+
+    mode: decayed (uses half_life_days) | window (uses window_days)
+    """
+    cache_headers = {"Cache-Control": POPULAR_PRODUCTS_CACHE_CONTROL}
+    # Changes with the order log and the day, like the trending product modes
+    orders_version = await run_in_threadpool(recommendation_system.orders_version)
+    day = recommendation_system.trending.current_day()
+    etag = make_etag("popular-categories", orders_version, day, num_categories, mode, half_life_days, window_days)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_headers)
+    body = response_cache.get(etag, "popular-categories")
+    if body is None:
+        try:
+            categories = recommendation_system.get_popular_categories(
+                num_categories, mode=mode, half_life_days=half_life_days, window_days=window_days
+            )
+            with span("serialization"):
+                body = dumps(categories)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response_cache.put(etag, body)
+    return FastJSONResponse(body, headers={"ETag": etag, **cache_headers})
        
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+"""Local OpenAI-compatible stand-in for load tests.
+
+Serves /v1/chat/completions with canned JSON after a configurable latency, so
+the services can be benchmarked without calling (or paying) OpenAI.
+
+Usage:
+    python mock_openai.py --port 8099 --latency-dist lognormal --latency-ms 800 --latency-spread 0.4
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+
+import pandas as pd
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Mock OpenAI")
+
+settings: Dict[str, Any] = {
+    "latency_dist": "constant",
+    "latency_ms": 0.0,
+    "latency_spread": 0.0,
+    "error_rate": 0.0,
+    "seed": None,
+}
+# Substring of the prompt -> canned assistant message content
+responses: Dict[str, str] = {}
+_rng = random.Random()
+
+
+def default_responses(product_ids: List[int]) -> Dict[str, str]:
+    recommendations = [
+        {
+            "product_id": str(product_id),
+            "confidence_score": round(0.9 - 0.1 * position, 2),
+            "reasons": ["Matches the user's preferred categories"]
+        }
+        for position, product_id in enumerate(product_ids[:5])
+    ]
+    return {
+        "retail analytics expert": json.dumps({
+            "user_type": "frequent",
+            "insights": ["Makes regular purchases of plywood products"],
+            "preferences": {
+                "preferred_categories": ["Plywood", "Hardware"],
+                "preferred_brands": ["GreenPly", "Century"],
+                "price_sensitivity": "medium",
+                "quality_preference": "high"
+            },
+            "recommendation_strategy": "Focus on premium quality products in preferred categories"
+        }),
+        "retail recommendation expert": json.dumps({"recommendations": recommendations}),
+        "structured information extractor": json.dumps({"products": []}),
+    }
+
+
+def sample_latency_seconds() -> float:
+    mean = settings["latency_ms"]
+    spread = settings["latency_spread"]
+    dist = settings["latency_dist"]
+    if dist == "uniform":
+        value = _rng.uniform(max(0.0, mean - spread), mean + spread)
+    elif dist == "normal":
+        value = _rng.gauss(mean, spread)
+    elif dist == "lognormal":
+        # spread is the sigma of the underlying normal; mean is the median latency
+        value = mean * _rng.lognormvariate(0.0, spread) if mean > 0 else 0.0
+    elif dist == "exponential":
+        value = _rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+    else:
+        value = mean
+    return max(0.0, value) / 1000.0
+
+
+def canned_content(messages: List[Dict[str, Any]]) -> str:
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    for marker, content in responses.items():
+        if marker in prompt:
+            return content
+    return "These products match the requested keywords."
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(sample_latency_seconds())
+
+    if _rng.random() < settings["error_rate"]:
+        return JSONResponse(status_code=500, content={"error": {"message": "Injected failure", "type": "server_error"}})
+
+    messages = body.get("messages", [])
+    content = canned_content(messages)
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+    # Rough 4-characters-per-token estimate, enough for token accounting in tests
+    prompt_tokens = prompt_chars // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-dist", choices=["constant", "uniform", "normal", "lognormal", "exponential"],
+                        default="constant")
+    parser.add_argument("--latency-ms", type=float, default=500.0, help="mean (median for lognormal) latency")
+    parser.add_argument("--latency-spread", type=float, default=0.0,
+                        help="half-width (uniform), stddev ms (normal) or sigma (lognormal)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--catalog", default="data/products.csv", help="product IDs for canned recommendations")
+    parser.add_argument("--responses", default=None, help="JSON file mapping prompt substrings to replies")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings.update(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_spread=args.latency_spread,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    _rng.seed(args.seed)
+    try:
+        product_ids = pd.read_csv(args.catalog, usecols=['ID'])['ID'].astype(int).tolist()
+    except (FileNotFoundError, ValueError):
+        product_ids = [1, 2, 3]
+    responses.update(default_responses(product_ids))
+    if args.responses:
+        with open(args.responses) as f:
+            responses.update(json.load(f))
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
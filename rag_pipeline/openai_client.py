@@ -1,11 +1,12 @@
 from openai import OpenAI
 from config import OPENAI_API_KEY
 import os
+import logging
 
-# Print debug information
-print("Environment variables:")
-print(f"OPENAI_API_KEY in env: {os.getenv('OPENAI_API_KEY')[:10] if os.getenv('OPENAI_API_KEY') else 'Not set'}")
-print(f"OPENAI_API_KEY from config: {OPENAI_API_KEY[:10]}")
+logger = logging.getLogger(__name__)
+
+# Debug information (never log key material)
+logger.debug("OPENAI_API_KEY in env: %s", "set" if os.getenv('OPENAI_API_KEY') else "not set")
 
 # Create a global OpenAI client
 openai_client = OpenAI(api_key=OPENAI_API_KEY) 
\ No newline at end of file
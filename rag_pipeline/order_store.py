@@ -0,0 +1,174 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import ORDER_COMPACT_THRESHOLD, ORDER_MAX_SEGMENTS
+
+ORDER_COLUMNS = [
+    'order_id', 'user_id', 'product_id', 'product_name', 'category', 'sub_category', 'brand',
+    'quantity', 'price_per_unit', 'total_amount', 'order_date', 'rating'
+]
+
+
+class OrderStore:
+    """Append-optimized order log with incrementally maintained stats.
+
+    Orders are appended to a small pending buffer and periodically compacted into
+    immutable DataFrame segments, so writes are O(1) and readers only ever see
+    immutable data plus a short list of pending rows. Product stats, a global
+    version and per-user versions are updated in the same pass as the append.
+    """
+
+    def __init__(self, orders: Optional[pd.DataFrame] = None,
+                 compact_threshold: int = ORDER_COMPACT_THRESHOLD, max_segments: int = ORDER_MAX_SEGMENTS):
+        self.compact_threshold = compact_threshold
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+
+        self._segments: List[pd.DataFrame] = []
+        # user_id -> [(segment number, row positions)]
+        self._user_index: Dict[str, List[Tuple[int, np.ndarray]]] = defaultdict(list)
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_by_user: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._frame_cache: Optional[Tuple[int, pd.DataFrame]] = None
+
+        # product_id -> [order_count, rating_sum, rating_count]
+        self._product_stats: Dict[int, List[float]] = {}
+        self._stats_cache: Optional[Tuple[int, pd.DataFrame]] = None
+        self._user_versions: Dict[str, int] = defaultdict(int)
+        self.version = 0
+
+        if orders is not None and not orders.empty:
+            orders = orders.reset_index(drop=True)
+            self._install_segment(orders)
+            # Seed the counters with one vectorized pass instead of per-order updates
+            grouped = orders.groupby('product_id')['rating'].agg(['size', 'sum', 'count'])
+            for product_id, row in zip(grouped.index.tolist(), grouped.itertuples(index=False)):
+                self._product_stats[int(product_id)] = [int(row[0]), float(row[1]), int(row[2])]
+            for user_id in self._user_index:
+                self._user_versions[user_id] = 1
+            self.version = 1
+
+    def __len__(self) -> int:
+        return sum(len(segment) for segment in self._segments) + len(self._pending)
+
+    def _install_segment(self, segment: pd.DataFrame):
+        number = len(self._segments)
+        self._segments.append(segment)
+        for user_id, positions in segment.groupby('user_id', sort=False).indices.items():
+            self._user_index[str(user_id)].append((number, positions))
+
+    def _update_stats(self, orders: Iterable[Dict[str, Any]]):
+        for order in orders:
+            stats = self._product_stats.setdefault(int(order['product_id']), [0, 0.0, 0])
+            stats[0] += 1
+            rating = order.get('rating')
+            if rating is not None and not pd.isna(rating):
+                stats[1] += float(rating)
+                stats[2] += 1
+
+    def extend(self, orders: List[Dict[str, Any]]) -> int:
+        """Append already-normalized orders; stats and versions are updated in the same pass"""
+        if not orders:
+            return 0
+        with self._lock:
+            self._pending.extend(orders)
+            for order in orders:
+                self._pending_by_user[order['user_id']].append(order)
+            self._update_stats(orders)
+            # One step per order, so workers applying the same log in different batches agree
+            for order in orders:
+                self._user_versions[order['user_id']] += 1
+            self.version += 1
+            should_compact = len(self._pending) >= self.compact_threshold
+        if should_compact:
+            self.compact()
+        return len(orders)
+
+    def compact(self):
+        """Move pending orders into a new immutable segment.
+
+        The DataFrame is built outside the main lock; pending rows stay visible to
+        readers until the segment is installed.
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return  # another thread is already compacting
+        try:
+            with self._lock:
+                batch = self._pending[:]
+            if not batch:
+                return
+            segment = pd.DataFrame(batch, columns=ORDER_COLUMNS)
+            merge = len(self._segments) >= self.max_segments
+            if merge:
+                # Keep the read fan-out bounded by folding all non-base segments together
+                segment = pd.concat(self._segments[1:] + [segment], ignore_index=True)
+            with self._lock:
+                if merge:
+                    self._segments = self._segments[:1]
+                    for user_id in list(self._user_index):
+                        self._user_index[user_id] = [entry for entry in self._user_index[user_id] if entry[0] == 0]
+                self._install_segment(segment)
+                del self._pending[:len(batch)]
+                counts: Dict[str, int] = defaultdict(int)
+                for order in batch:
+                    counts[order['user_id']] += 1
+                for user_id, count in counts.items():
+                    del self._pending_by_user[user_id][:count]
+                    if not self._pending_by_user[user_id]:
+                        del self._pending_by_user[user_id]
+        finally:
+            self._compact_lock.release()
+
+    def user_orders(self, user_id: str) -> pd.DataFrame:
+        """Orders for one user, assembled from their indexed rows in each segment"""
+        user_id = str(user_id)
+        with self._lock:
+            segments = self._segments
+            entries = list(self._user_index.get(user_id, ()))
+            pending = list(self._pending_by_user.get(user_id, ()))
+        parts = [segments[number].iloc[positions] for number, positions in entries]
+        if pending:
+            parts.append(pd.DataFrame(pending, columns=ORDER_COLUMNS))
+        if not parts:
+            return pd.DataFrame(columns=ORDER_COLUMNS)
+        if len(parts) == 1:
+            return parts[0].copy()
+        return pd.concat(parts, ignore_index=True)
+
+    def frame(self) -> pd.DataFrame:
+        """Full order history as one DataFrame (cached until the next write)"""
+        with self._lock:
+            if self._frame_cache is not None and self._frame_cache[0] == self.version:
+                return self._frame_cache[1]
+            version = self.version
+            parts = list(self._segments)
+            if self._pending:
+                parts.append(pd.DataFrame(self._pending, columns=ORDER_COLUMNS))
+        if not parts:
+            return pd.DataFrame()
+        frame = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+        with self._lock:
+            self._frame_cache = (version, frame)
+        return frame
+
+    def product_stats(self) -> pd.DataFrame:
+        """Per-product order_count, avg_rating and rating_count from the incremental counters"""
+        with self._lock:
+            if self._stats_cache is not None and self._stats_cache[0] == self.version:
+                return self._stats_cache[1]
+            version = self.version
+            items = [(product_id, *stats) for product_id, stats in self._product_stats.items()]
+        stats = pd.DataFrame(items, columns=['product_id', 'order_count', 'rating_sum', 'rating_count'])
+        stats['avg_rating'] = stats['rating_sum'] / stats['rating_count'].replace(0, np.nan)
+        stats = stats[['product_id', 'order_count', 'avg_rating', 'rating_count']]
+        with self._lock:
+            self._stats_cache = (version, stats)
+        return stats
+
+    def user_version(self, user_id: str) -> int:
+        return self._user_versions.get(str(user_id), 0)
@@ -2,6 +2,9 @@ import pandas as pd
 from typing import List, Dict, Any
 import os
 from config import PDF_PATH  # Update this to your actual CSV path
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class CSVProcessor:
@@ -28,7 +31,7 @@ class CSVProcessor:
             return products
 
         except Exception as e:
-            print(f"Error processing CSV: {str(e)}")
+            logger.error("Error processing CSV: %s", e)
             return []
 
     @staticmethod
@@ -0,0 +1,336 @@
+"""Opt-in request profiling and memory accounting.
+
+A sampled request (PROFILE_SAMPLE_RATE, or the PROFILE_HEADER debug header
+sent with the admin token) gets a Profile. While it is active, a single sampler thread reads the stacks of
+the threads doing that request's work every PROFILE_INTERVAL_SECONDS, and the
+counts are written as folded stacks (one "frame;frame;frame count" line per
+stack) that flamegraph.pl and speedscope read directly. A thread works for a
+profile inside a telemetry span or a run_in_threadpool() call from this module.
+Unsampled requests pay one context variable lookup per span.
+
+memory_report() sizes registered components on demand and, when the process
+was started with TRACEMALLOC_FRAMES > 0, adds the top allocation sites.
+"""
+import contextvars
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from starlette.concurrency import run_in_threadpool as _run_in_threadpool
+
+from config import (PROFILE_SAMPLE_RATE, PROFILE_HEADER, PROFILE_INTERVAL_SECONDS, PROFILE_DIR, PROFILE_KEEP,
+                    PROFILE_MAX_DEPTH, TRACEMALLOC_FRAMES, ADMIN_TOKEN)
+
+logger = logging.getLogger(__name__)
+
+# Lock, thread and similar objects have no meaningful deep size; count only their own header
+_OPAQUE_TYPES = (type, type(sys), type(len), type(lambda: None), threading.Thread, type(threading.Lock()),
+                 type(threading.RLock()), threading.Event, threading.Condition, logging.Logger)
+# Bound on objects visited by one deep_sizeof() call, so a report on a huge graph stays cheap
+MAX_SIZED_OBJECTS = 2_000_000
+
+
+class Profile:
+    """Stack samples for one request"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.perf_counter()
+        # thread ident -> nesting depth of attach() on that thread
+        self._threads: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def attach(self):
+        """Sample the calling thread for this profile until the block exits"""
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] = self._threads.get(ident, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                depth = self._threads.pop(ident) - 1
+                if depth:
+                    self._threads[ident] = depth
+
+    def threads(self) -> List[int]:
+        with self._lock:
+            return list(self._threads)
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _fold(frame, max_depth: int = PROFILE_MAX_DEPTH) -> str:
+    """Root-first "func (file:line);..." for a frame and its callers"""
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """One background thread sampling every active profile; idle while nothing is profiled"""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._active: List[Profile] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._active.append(profile)
+            # Threads don't survive a fork; start one per worker process
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._wake = threading.Event()
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, profile: Profile):
+        with self._lock:
+            if profile in self._active:
+                self._active.remove(profile)
+
+    def _sample(self, profiles: List[Profile]):
+        frames = sys._current_frames()
+        for profile in profiles:
+            for ident in profile.threads():
+                frame = frames.get(ident)
+                if frame is not None:
+                    profile.stacks[_fold(frame)] += 1
+            profile.samples += 1
+
+    def _run(self):
+        while True:
+            with self._lock:
+                profiles = list(self._active)
+            if not profiles:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            self._sample(profiles)
+            time.sleep(self.interval)
+
+
+sampler = Sampler()
+
+_current_profile: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar("current_profile", default=None)
+
+
+@contextmanager
+def attach_current_thread():
+    """Used by telemetry.span: sample this thread if the current request is being profiled"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.attach():
+        yield
+
+
+async def run_in_threadpool(func: Callable, *args, **kwargs) -> Any:
+    """starlette's run_in_threadpool, sampling the worker thread when the request is profiled"""
+    profile = _current_profile.get()
+    if profile is None:
+        return await _run_in_threadpool(func, *args, **kwargs)
+
+    def attached():
+        with profile.attach():
+            return func(*args, **kwargs)
+    return await _run_in_threadpool(attached)
+
+
+def should_profile(headers) -> bool:
+    # Profiling slows a request down, so only an admin may force it
+    if (PROFILE_HEADER and ADMIN_TOKEN and headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes")
+            and hmac.compare_digest(headers.get("X-Admin-Token", ""), ADMIN_TOKEN)):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _profile_name(method: str, path: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", path).strip("-") or "root"
+    return f"{int(time.time() * 1000)}-{os.getpid()}-{method.lower()}-{slug}"
+
+
+def begin_profile(method: str, path: str) -> contextvars.Token:
+    profile = Profile(_profile_name(method, path))
+    sampler.add(profile)
+    return _current_profile.set(profile)
+
+
+def end_profile(token: contextvars.Token, profile_dir: str = PROFILE_DIR) -> Optional[str]:
+    """Stop sampling and save the folded stacks; returns the profile name, or None if nothing was sampled"""
+    profile = _current_profile.get()
+    _current_profile.reset(token)
+    sampler.remove(profile)
+    if not profile.stacks:
+        return None
+    try:
+        os.makedirs(profile_dir, exist_ok=True)
+        with open(os.path.join(profile_dir, profile.name + ".folded"), "w") as f:
+            f.write(profile.folded())
+        _prune(profile_dir)
+    except OSError:
+        logger.exception("Could not save profile %s", profile.name)
+        return None
+    logger.info("Saved request profile %s", profile.name,
+                extra={"samples": profile.samples, "seconds": round(time.perf_counter() - profile.started, 3)})
+    return profile.name
+
+
+def _prune(profile_dir: str, keep: int = PROFILE_KEEP):
+    names = sorted(name for name in os.listdir(profile_dir) if name.endswith(".folded"))
+    for name in names[:-keep]:
+        try:
+            os.remove(os.path.join(profile_dir, name))
+        except OSError:
+            pass
+
+
+def list_profiles(profile_dir: str = PROFILE_DIR) -> List[Dict[str, Any]]:
+    """Saved profiles from every worker sharing profile_dir, newest first"""
+    if not os.path.isdir(profile_dir):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(profile_dir), reverse=True):
+        if name.endswith(".folded"):
+            path = os.path.join(profile_dir, name)
+            profiles.append({"name": name[:-len(".folded")], "bytes": os.path.getsize(path)})
+    return profiles
+
+
+def read_profile(name: str, profile_dir: str = PROFILE_DIR) -> Optional[str]:
+    if not re.fullmatch(r"[A-Za-z0-9-]+", name):
+        return None
+    try:
+        with open(os.path.join(profile_dir, name + ".folded")) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def install(app):
+    """Profile sampled requests of a FastAPI app; the saved profile's name is returned in X-Profile"""
+
+    @app.middleware("http")
+    async def profiling_middleware(request, call_next):
+        if not should_profile(request.headers):
+            return await call_next(request)
+        token = begin_profile(request.method, request.url.path)
+        try:
+            response = await call_next(request)
+        finally:
+            name = end_profile(token)
+        if name is not None:
+            response.headers["X-Profile"] = name
+        return response
+
+
+def deep_sizeof(obj: Any, limit: int = MAX_SIZED_OBJECTS) -> int:
+    """Approximate bytes reachable from obj; pandas and NumPy data are sized by their buffers"""
+    seen = set()
+    pending = [obj]
+    total = 0
+    while pending and len(seen) < limit:
+        current = pending.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, (pd.DataFrame, pd.Series, pd.Index)):
+            usage = current.memory_usage(deep=True)
+            total += int(usage.sum() if isinstance(usage, pd.Series) else usage)
+            continue
+        if isinstance(current, np.ndarray):
+            total += sys.getsizeof(current) + (current.nbytes if current.base is None else 0)
+            continue
+        if hasattr(current, "ntotal") and hasattr(current, "code_size"):
+            # FAISS index: the stored codes (memory-mapped indexes count here though they live in the page cache)
+            total += int(current.ntotal) * int(current.code_size)
+            continue
+        total += sys.getsizeof(current)
+        if isinstance(current, (str, bytes, int, float, bool, type(None)) + _OPAQUE_TYPES):
+            continue
+        if isinstance(current, dict):
+            pending.extend(current.keys())
+            pending.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            pending.extend(current)
+        else:
+            if hasattr(current, "__dict__"):
+                pending.append(vars(current))
+            for slot in getattr(type(current), "__slots__", ()):
+                if hasattr(current, slot):
+                    pending.append(getattr(current, slot))
+    return total
+
+
+# name -> callable returning the object to size
+_components: Dict[str, Callable[[], Any]] = {}
+
+
+def register_component(name: str, getter: Callable[[], Any]):
+    """Include getter() in memory reports; getter is called per report so swapped objects are followed"""
+    _components[name] = getter
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def memory_report(top: int = 20) -> Dict[str, Any]:
+    """Process RSS, per-component sizes (components may share objects) and, if tracing, top allocation sites"""
+    components = {}
+    for name, getter in _components.items():
+        try:
+            components[name] = deep_sizeof(getter())
+        except Exception as e:
+            components[name] = f"error: {e}"
+    report: Dict[str, Any] = {"pid": os.getpid(), "rss_bytes": _rss_bytes(), "components": components}
+
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        report["tracemalloc"] = {
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"site": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+        }
+    else:
+        report["tracemalloc"] = None
+    return report
+
+
+if TRACEMALLOC_FRAMES > 0 and not tracemalloc.is_tracing():
+    tracemalloc.start(TRACEMALLOC_FRAMES)
@@ -0,0 +1,99 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+
+def _to_builtin(obj):
+    # NumPy scalars coming out of pandas rows expose .item()
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class RecommendationStore:
+    """SQLite-backed key-value store of precomputed recommendations, keyed by user ID.
+
+    Each row records the user's order version and the catalog content id it was
+    computed from, so a reader can tell when a newer order or catalog makes it stale.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS recommendations ("
+            "user_id TEXT PRIMARY KEY, "
+            "computed_at REAL NOT NULL, "
+            "payload TEXT NOT NULL, "
+            "order_version INTEGER, "
+            "catalog_id TEXT"
+            ") WITHOUT ROWID"
+        )
+        # Stores written before the version columns existed: their rows never match and are recomputed live
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(recommendations)")}
+        for column, column_type in (("order_version", "INTEGER"), ("catalog_id", "TEXT")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE recommendations ADD COLUMN {column} {column_type}")
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared across threads, or across a pre-fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def put_many(self, rows: Iterable[Tuple[str, List[Dict[str, Any]], int]], computed_at: Optional[float] = None,
+                 catalog_id: Optional[str] = None) -> int:
+        """Write (user_id, recommendations, order_version) rows, computed from catalog_id, in a single transaction"""
+        computed_at = computed_at if computed_at is not None else time.time()
+        records = [
+            (str(user_id), computed_at, json.dumps(recommendations, separators=(",", ":"), default=_to_builtin),
+             order_version, catalog_id)
+            for user_id, recommendations, order_version in rows
+        ]
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO recommendations (user_id, computed_at, payload, order_version, catalog_id) "
+                "VALUES (?, ?, ?, ?, ?)",
+                records
+            )
+        return len(records)
+
+    def _row(self, user_id: str) -> Optional[tuple]:
+        return self._connection().execute(
+            "SELECT payload, computed_at, order_version, catalog_id FROM recommendations WHERE user_id = ?",
+            (str(user_id),)
+        ).fetchone()
+
+    def get(self, user_id: str) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """Return (recommendations, computed_at) for a user, or None if nothing was precomputed"""
+        row = self._row(user_id)
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def get_fresh(self, user_id: str, max_age_seconds: float, order_version: Optional[int] = None,
+                  catalog_id: Optional[str] = None) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """Like get, but treats entries older than max_age_seconds, or computed from another order version
+        or catalog (when those are given), as missing"""
+        row = self._row(user_id)
+        if row is None or time.time() - row[1] > max_age_seconds:
+            return None
+        if order_version is not None and row[2] != order_version:
+            return None
+        if catalog_id is not None and row[3] != catalog_id:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM recommendations").fetchone()[0]
@@ -1,90 +1,229 @@
+import math
+import numbers
 import pandas as pd
-import numpy as np
-from collections import defaultdict
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
-import random
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
 from ai_analyzer import AIAnalyzer
 import json
 from openai import OpenAI
 from config import OPENAI_API_KEY
 from config import PDF_PATH
+from catalog import ProductCatalog
+from order_store import OrderStore
+from trending import TrendingEngine
+from data_generator import generate_orders
+from config import DUMMY_NUM_ORDERS, DUMMY_NUM_USERS, DUMMY_ORDER_SEED, DUMMY_ORDER_END_DATE
+from telemetry import span, timed, record_llm_usage, registry
+import logging
+import threading
+from state_store import StateStore, LocalStateStore
+
+logger = logging.getLogger(__name__)
+
+ORDER_LOG = "orders"
+
+QUARANTINED_ORDERS = registry.counter("shopwhisper_orders_quarantined_total",
+                                      "Order log records skipped because they could not be applied")
 
 class RecommendationSystem:
-    def __init__(self, data_path: str = PDF_PATH):
+    def __init__(self, data_path: str = PDF_PATH, order_history: Optional[pd.DataFrame] = None,
+                 state: Optional[StateStore] = None, catalog: Optional[ProductCatalog] = None):
         try:
-            # Load products directly from CSV
-            print("Loading products from CSV...")
-            self.products = pd.read_csv(data_path)
-            print(f"Loaded {len(self.products)} products")
+            # Load products into an ID-indexed, typed catalog, unless one was already loaded
+            if catalog is None:
+                with span("csv_load"):
+                    catalog = ProductCatalog.load(data_path)
+            self.catalog = catalog
+            logger.info("Loaded %d products", len(self.products), extra={"path": data_path})
             
             # Initialize in-memory order history
-            print("Generating dummy orders...")
-            self.order_history = self._generate_dummy_orders()
-            print(f"Generated {len(self.order_history)} orders")
+            if order_history is None:
+                logger.info("Generating dummy orders")
+                order_history = self._generate_dummy_orders()
+            self.orders = OrderStore(order_history)
+            logger.info("Loaded %d orders", len(self.orders))
+
+            self.trending = TrendingEngine()
+            self.trending.record_frame(order_history)
             
         except FileNotFoundError:
-            print(f"Warning: Products CSV not found at {data_path}. Using empty product list.")
-            self.products = pd.DataFrame([])
+            logger.warning("Products file not found at %s, using empty product list", data_path)
+            self.catalog = ProductCatalog(pd.DataFrame([]))
+            self.orders = OrderStore()
+            self.trending = TrendingEngine()
             
         # Initialize AI analyzer
         self.ai_analyzer = AIAnalyzer()
+
+        # Ingested orders go through the state store's order log, so every worker
+        # process sharing the store applies the same orders in the same sequence
+        self.state = state if state is not None else LocalStateStore()
+        self._sync_lock = threading.Lock()
+        self._order_log_seq = 0
+        self._order_id_base = len(self.orders)
+        self.sync_orders()
+
+    @property
+    def products(self) -> pd.DataFrame:
+        return self.catalog.frame
+
+    def set_catalog(self, catalog: ProductCatalog):
+        """Swap in a new catalog version.
+
+        Methods read self.catalog once and use that reference throughout, so calls
+        already running finish on the catalog they started with.
+        """
+        self.catalog = catalog
+
+    @property
+    def order_history(self) -> pd.DataFrame:
+        """Full order history, including ingested orders"""
+        return self.orders.frame()
         
     def _generate_dummy_orders(self) -> pd.DataFrame:
-        """Generate dummy order history data"""
-        if self.products.empty:
-            return pd.DataFrame()
-            
-        orders = []
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
-        
-        # Generate 1000 random orders
-        user_ids = list(range(1, 101))  # 100 users with IDs from 1 to 100
-        
-        for _ in range(1000):
-            user_id = str(random.choice(user_ids))  # Convert to string for consistency
-            product = self.products.iloc[random.randint(0, len(self.products)-1)]
-            
-            # Generate order date
-            order_date = start_date + timedelta(days=random.randint(0, 365))
-            
-            # Generate quantity based on category
-            if product['Category'] in ['Hardware', 'Adhesive']:
-                quantity = random.randint(1, 10)
-            else:
-                quantity = random.randint(1, 3)
-                
-            # Calculate total amount
-            total_amount = float(product['Price']) * quantity
-            
-            # Generate rating (70% of orders have ratings)
-            rating = random.choice([None] + [i/2 for i in range(6, 11)]) if random.random() > 0.3 else None
-            
-            order = {
-                'order_id': f"ORD_{len(orders)+1}",
-                'user_id': user_id,
-                'product_id': product['ID'],
-                'product_name': product['Product Name'],
-                'category': product['Category'],
-                'sub_category': product['Sub-Category'],
-                'brand': product['Brand'],
-                'quantity': quantity,
-                'price_per_unit': product['Price'],
-                'total_amount': total_amount,
-                'order_date': order_date.strftime("%Y-%m-%d"),
-                'rating': rating
-            }
-            orders.append(order)
-        
-        return pd.DataFrame(orders)
+        """Generate dummy order history data (seeded, and ending today unless DUMMY_ORDER_END_DATE is set)"""
+        return generate_orders(
+            self.products,
+            num_orders=DUMMY_NUM_ORDERS,
+            num_users=DUMMY_NUM_USERS,
+            seed=DUMMY_ORDER_SEED,
+            end_date=datetime.strptime(DUMMY_ORDER_END_DATE, "%Y-%m-%d") if DUMMY_ORDER_END_DATE else None
+        )
         
     def get_user_orders(self, user_id: str) -> pd.DataFrame:
         """Get order history for a specific user"""
         # Handle both string and integer user IDs
         user_id = str(user_id).replace('USER_', '')  # Remove USER_ prefix if present
-        return self.order_history[self.order_history['user_id'] == user_id].copy()
+        self.sync_orders()
+        return self.orders.user_orders(user_id)
+
+    @staticmethod
+    def _parse_order_date(value: Any) -> str:
+        """YYYY-MM-DD, not in the future; today when missing.
+
+        A bad date would fail trending on every later sync, and a future one
+        would advance the trending day and expire every window count.
+        """
+        today = datetime.now().date()
+        if value in (None, ''):
+            return today.strftime("%Y-%m-%d")
+        try:
+            order_date = datetime.strptime(str(value), "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError(f"order_date must be YYYY-MM-DD, got {value!r}")
+        if order_date > today:
+            raise ValueError(f"order_date {value} is in the future")
+        return order_date.strftime("%Y-%m-%d")
+
+    @staticmethod
+    def _parse_int(field: str, value: Any) -> int:
+        """An integer, or a string of digits; bools and floats such as 3.7 are rejected"""
+        if isinstance(value, bool) or not isinstance(value, (numbers.Integral, str)):
+            raise ValueError(f"{field} must be an integer, got {value!r}")
+        if isinstance(value, str) and not value.strip().isdigit():
+            raise ValueError(f"{field} must be an integer, got {value!r}")
+        return int(value)
+
+    @staticmethod
+    def _parse_number(field: str, value: Any) -> float:
+        """A finite number (or numeric string); NaN and infinity would poison every aggregate they reach"""
+        if isinstance(value, bool) or not isinstance(value, (numbers.Real, str)):
+            raise ValueError(f"{field} must be a number, got {value!r}")
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(f"{field} must be a finite number, got {value!r}")
+        return number
+
+    def _normalize_order(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate an incoming order and fill product fields from the catalog"""
+        if not isinstance(raw, dict):
+            raise ValueError("Order must be a JSON object")
+        missing = [field for field in ('user_id', 'product_id') if raw.get(field) in (None, '')]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+        if isinstance(raw['user_id'], bool) or not isinstance(raw['user_id'], (str, int)):
+            raise ValueError(f"user_id must be a string or an integer, got {raw['user_id']!r}")
+
+        product_id = self._parse_int('product_id', raw['product_id'])
+        product = self.catalog.find(product_id)
+        if product is None:
+            raise ValueError(f"Unknown product_id: {raw['product_id']}")
+
+        quantity = self._parse_int('quantity', raw.get('quantity', 1))
+        if quantity <= 0:
+            raise ValueError("quantity must be positive")
+        price = self._parse_number('price_per_unit', raw.get('price_per_unit', product['Price']))
+        rating = raw.get('rating')
+        order_date = self._parse_order_date(raw.get('order_date'))
+
+        return {
+            # Orders without an ID get one from their log sequence number in sync_orders
+            'order_id': str(raw['order_id']) if raw.get('order_id') else None,
+            'user_id': str(raw['user_id']).replace('USER_', ''),
+            'product_id': int(product['ID']),
+            'product_name': product['Product Name'],
+            'category': product['Category'],
+            'sub_category': product['Sub-Category'],
+            'brand': product['Brand'],
+            'quantity': quantity,
+            'price_per_unit': price,
+            'total_amount': self._parse_number('total_amount', raw.get('total_amount', price * quantity)),
+            'order_date': order_date,
+            'rating': self._parse_number('rating', rating) if rating is not None else None
+        }
+
+    def ingest_orders(self, orders: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Append real orders to the order store, updating stats and user versions in the same pass"""
+        accepted = []
+        rejected = []
+        for position, raw in enumerate(orders):
+            try:
+                accepted.append(self._normalize_order(raw))
+            except (KeyError, ValueError, TypeError) as e:
+                rejected.append({"index": position, "error": str(e)})
+        if accepted:
+            self.state.append(ORDER_LOG, accepted)
+            self.sync_orders()
+        return {"accepted": len(accepted), "rejected": rejected}
+
+    def sync_orders(self) -> int:
+        """Apply orders appended to the shared order log since the last sync"""
+        with self._sync_lock:
+            records = self.state.read(ORDER_LOG, self._order_log_seq)
+            if not records:
+                return 0
+            orders = []
+            for seq, order in records:
+                try:
+                    if not order.get('order_id'):
+                        order['order_id'] = f"ORD_{self._order_id_base + seq}"
+                    order['product_id'] = int(order['product_id'])
+                    order['user_id'] = str(order['user_id'])
+                    order['order_date'] = self._parse_order_date(order.get('order_date'))
+                except (KeyError, ValueError, TypeError) as e:
+                    # Quarantined: skipped by every worker, instead of failing every sync from here on
+                    QUARANTINED_ORDERS.inc()
+                    logger.warning("Skipping order log record %d: %s", seq, e, extra={"record": order})
+                    continue
+                orders.append(order)
+            try:
+                self.orders.extend(orders)
+                self.trending.record_orders(orders)
+            finally:
+                # Never re-read these records: a retry would append the same orders again
+                self._order_log_seq = records[-1][0]
+            return len(orders)
         
+    def orders_version(self) -> int:
+        """Position in the shared order log; the same in every worker that has applied the same orders"""
+        self.sync_orders()
+        return self._order_log_seq
+
+    def user_orders_version(self, user_id: str) -> int:
+        """Changes whenever an order for user_id is applied"""
+        self.sync_orders()
+        return self.orders.user_version(str(user_id).replace('USER_', ''))
+
     def analyze_user_behavior(self, user_id: str) -> Dict[str, Any]:
         """Analyze user's purchasing behavior using AI"""
         user_purchases = self.get_user_orders(user_id)
@@ -92,46 +231,60 @@ class RecommendationSystem:
     
     def get_recommendations(self, user_id: str, num_recommendations: int = 5) -> List[Dict[str, Any]]:
         """Get AI-powered product recommendations"""
-        print(f"Getting recommendations for user {user_id}")
+        return self.get_recommendations_with_status(user_id, num_recommendations)[0]
+
+    def get_recommendations_with_status(self, user_id: str,
+                                        num_recommendations: int = 5) -> Tuple[List[Dict[str, Any]], bool]:
+        """Recommendations, and whether they fell back to local scoring because the LLM call failed"""
+        logger.debug("Getting recommendations", extra={"user_id": user_id})
+        catalog = self.catalog
         
-        if self.products.empty:
-            print("No products available")
-            return []
+        if catalog.empty:
+            logger.warning("No products available")
+            return [], False
             
         # Get user's behavior analysis
         user_analysis = self.analyze_user_behavior(user_id)
-        print(f"User analysis: {user_analysis}")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Only pay for formatting the analysis when debug logging is on
+            logger.debug("User analysis", extra={"user_id": user_id, "analysis": user_analysis})
         
         if user_analysis["user_type"] == "new":
-            print("New user, getting basic recommendations")
-            recommendations = self._get_basic_recommendations(user_analysis, num_recommendations)
-            print(f"Generated {len(recommendations)} basic recommendations")
-            return recommendations
+            recommendations = self._get_basic_recommendations(user_analysis, num_recommendations, catalog)
+            logger.debug("New user, generated %d basic recommendations", len(recommendations))
+            return recommendations, False
         
         try:
-            print("Getting AI recommendations")
             # Get AI recommendations
+            with span("prompt_build"):
+                prompt = self.ai_analyzer.get_recommendation_prompt(user_analysis, catalog.records())
             client = OpenAI(api_key=OPENAI_API_KEY)
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a retail recommendation expert."},
-                    {"role": "user", "content": self.ai_analyzer.get_recommendation_prompt(
-                        user_analysis,
-                        self.products.to_dict('records')
-                    )}
-                ]
-            )
+            with span("llm_call"):
+                response = client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": "You are a retail recommendation expert."},
+                        {"role": "user", "content": prompt}
+                    ]
+                )
+            record_llm_usage("recommendations", response)
             
             # Parse AI recommendations
-            ai_recommendations = json.loads(response.choices[0].message.content)
-            print(f"Got {len(ai_recommendations.get('recommendations', []))} AI recommendations")
+            with span("json_parse"):
+                ai_recommendations = json.loads(response.choices[0].message.content)
+            logger.debug("Got %d AI recommendations", len(ai_recommendations.get('recommendations', [])))
             
             # Convert to final format with multiple reasons
             recommendations = []
-            for rec in ai_recommendations["recommendations"][:num_recommendations]:
+            # The prompt only lists recent purchases; drop anything bought before them too
+            purchased_ids = set(user_analysis.get('purchased_product_ids', []))
+            for rec in ai_recommendations["recommendations"]:
+                if len(recommendations) >= num_recommendations:
+                    break
                 try:
-                    product = self.products[self.products['ID'] == int(rec['product_id'])].iloc[0]
+                    if int(rec['product_id']) in purchased_ids:
+                        continue
+                    card = catalog.card(rec['product_id'])
                     
                     # Ensure reasons is a list
                     reasons = rec.get('reasons', [])
@@ -140,53 +293,50 @@ class RecommendationSystem:
                     elif not isinstance(reasons, list):
                         reasons = [str(reasons)]
                     
-                    recommendations.append({
-                        'product_id': product['ID'],
-                        'product_name': product['Product Name'],
-                        'category': product['Category'],
-                        'brand': product['Brand'],
-                        'price': product['Price'],
-                        'confidence_score': float(rec.get('confidence_score', 0.5)),
-                        'reasons': reasons
-                    })
+                    card['confidence_score'] = float(rec.get('confidence_score', 0.5))
+                    card['reasons'] = reasons
+                    recommendations.append(card)
                 except (KeyError, ValueError, IndexError) as e:
-                    print(f"Error processing recommendation: {str(e)}")
+                    logger.warning("Skipping invalid AI recommendation: %s", e)
                     continue
             
             if not recommendations:
                 raise ValueError("No valid recommendations generated")
                 
-            print(f"Returning {len(recommendations)} AI recommendations")
-            return recommendations
+            return recommendations, False
             
         except Exception as e:
-            print(f"Error getting AI recommendations: {str(e)}")
-            print("Falling back to basic recommendations")
-            # Fallback to basic recommendations
-            recommendations = self._get_basic_recommendations(user_analysis, num_recommendations)
-            print(f"Generated {len(recommendations)} fallback recommendations")
-            return recommendations
+            logger.warning("AI recommendations failed, falling back to basic recommendations: %s", e)
+            # Fallback to basic recommendations; callers must not cache these as the AI answer
+            return self._get_basic_recommendations(user_analysis, num_recommendations, catalog), True
+
+    def get_local_recommendations(self, user_id: str, num_recommendations: int = 5) -> List[Dict[str, Any]]:
+        """Get recommendations from the local scoring engine only, without any LLM calls"""
+        user_orders = self.get_user_orders(user_id)
+        if user_orders.empty:
+            # Empty history short-circuits before the LLM is called
+            user_analysis = self.ai_analyzer.analyze_user_behavior(user_orders)
+        else:
+            user_analysis = self.ai_analyzer._basic_analysis(user_orders)
+        return self._get_basic_recommendations(user_analysis, num_recommendations)
     
-    def _get_basic_recommendations(self, user_analysis: Dict[str, Any], num_recommendations: int = 5) -> List[Dict[str, Any]]:
+    @timed("scoring")
+    def _get_basic_recommendations(self, user_analysis: Dict[str, Any], num_recommendations: int = 5,
+                                   catalog: Optional[ProductCatalog] = None) -> List[Dict[str, Any]]:
         """Fallback method for basic recommendations"""
-        print("Starting basic recommendations")
         recommendations = []
+        catalog = catalog if catalog is not None else self.catalog
+        products = catalog.frame
         
-        if self.products.empty:
-            print("No products available for basic recommendations")
+        if products.empty:
+            logger.warning("No products available for basic recommendations")
             return []
             
-        if self.order_history.empty:
-            print("No order history available for basic recommendations")
+        if len(self.orders) == 0:
+            logger.warning("No order history available for basic recommendations")
             return []
         
-        # Get product stats for scoring
-        product_stats = self.order_history.groupby('product_id').agg({
-            'order_id': 'count',
-            'rating': ['mean', 'count']
-        }).reset_index()
-        product_stats.columns = ['product_id', 'order_count', 'avg_rating', 'rating_count']
-        print(f"Calculated stats for {len(product_stats)} products")
+        avg_category_prices = catalog.category_average_prices()
         
         # Get user preferences from analysis
         preferred_categories = user_analysis.get('preferences', {}).get('preferred_categories', [])
@@ -194,15 +344,15 @@ class RecommendationSystem:
         price_sensitivity = user_analysis.get('preferences', {}).get('price_sensitivity', 'medium')
         quality_preference = user_analysis.get('preferences', {}).get('quality_preference', 'medium')
         
-        # Get user's purchased products to avoid immediate repeats
+        # Get user's purchased products to avoid repeats; the recent orders only cover the last few
         purchased_products = {item['product_name'] for item in user_analysis.get('purchased_products', [])}
+        purchased_ids = set(user_analysis.get('purchased_product_ids', []))
         
-        for _, product in self.products.iterrows():
-            # Skip if user recently purchased this product
-            if product['Product Name'] in purchased_products:
+        for _, product in products.iterrows():
+            # Skip if user already purchased this product
+            if product['Product Name'] in purchased_products or product['ID'] in purchased_ids:
                 continue
                 
-            stats = product_stats[product_stats['product_id'] == product['ID']].iloc[0] if len(product_stats[product_stats['product_id'] == product['ID']]) > 0 else None
             reasons = []
             score = 0
             
@@ -225,7 +375,7 @@ class RecommendationSystem:
                 reasons.append(f"High customer rating of {product['Rating']}/5")
             
             # Add price sensitivity based reasons
-            avg_category_price = self.products[self.products['Category'] == product['Category']]['Price'].mean()
+            avg_category_price = avg_category_prices[product['Category']]
             if price_sensitivity == 'high' and product['Price'] < avg_category_price:
                 score += 1
                 reasons.append("Competitively priced for its category")
@@ -256,7 +406,7 @@ class RecommendationSystem:
                     score += 0.5
             
             # Add discount-based reasons
-            if product['Discount'] != '0%':
+            if product['Discount_Pct'] > 0:
                 reasons.append(f"Special {product['Discount']} discount available")
                 score += 0.5
             
@@ -281,23 +431,63 @@ class RecommendationSystem:
         
         # Sort by score and return top recommendations
         recommendations.sort(key=lambda x: x['confidence_score'], reverse=True)
-        print(f"Generated {len(recommendations)} recommendations before filtering")
         final_recommendations = recommendations[:num_recommendations]
-        print(f"Returning {len(final_recommendations)} final recommendations")
+        logger.debug("Scored %d candidates, returning %d", len(recommendations), len(final_recommendations))
         return final_recommendations
     
-    def get_popular_products(self, num_products: int = 5) -> List[Dict[str, Any]]:
-        """Get popular products based on all users' order history"""
-        if self.products.empty or self.order_history.empty:
+    def get_popular_categories(self, num_categories: int = 5, mode: str = "decayed",
+                               half_life_days: Optional[float] = None,
+                               window_days: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Trending categories: "decayed" or "window" mode, as in get_popular_products"""
+        self.sync_orders()
+        ranked = self.trending.top_categories(num_categories, mode, half_life_days, window_days)
+        return [{'category': category, 'trend_score': round(float(score), 3)} for category, score in ranked]
+
+    def get_popular_products(self, num_products: int = 5, mode: str = "all_time", half_life_days: Optional[float] = None,
+                             window_days: Optional[int] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get popular products based on all users' order history.
+
+        mode is "all_time" (order count, then rating), "decayed" (exponentially
+        decayed order count with the given half-life) or "window" (orders in the
+        last window_days days). category restricts the ranking to one category.
+        """
+        self.sync_orders()
+        catalog = self.catalog
+        if catalog.empty or len(self.orders) == 0:
             return []
             
-        # Calculate product popularity based on order count and ratings
-        product_stats = self.order_history.groupby('product_id').agg({
-            'order_id': 'count',
-            'rating': 'mean'
-        }).reset_index()
-        
-        product_stats.columns = ['product_id', 'order_count', 'avg_rating']
+        # Product popularity from the incrementally maintained order counts and ratings
+        product_stats = self.orders.product_stats()
+
+        if mode != "all_time":
+            ranked = self.trending.top_products(num_products, mode, half_life_days, window_days, category)
+            stats_by_id = {
+                int(product_id): (int(order_count), avg_rating)
+                for product_id, order_count, avg_rating
+                in product_stats[['product_id', 'order_count', 'avg_rating']].itertuples(index=False)
+            }
+            if mode == "window":
+                reason = f"Among the most ordered products in the last {window_days or self.trending.windows_days[0]} days"
+            else:
+                reason = "Trending product with recent demand"
+            popular_products = []
+            for product_id, score in ranked:
+                if product_id not in catalog:
+                    continue
+                card = catalog.card(product_id)
+                order_count, avg_rating = stats_by_id.get(int(product_id), (0, None))
+                card.update({
+                    'order_count': order_count,
+                    'avg_rating': round(avg_rating, 1) if avg_rating is not None and not pd.isna(avg_rating) else None,
+                    'trend_score': round(float(score), 3),
+                    'reason': reason
+                })
+                popular_products.append(card)
+            return popular_products
+
+        if category is not None:
+            category_ids = catalog.frame.loc[catalog.frame['Category'] == category, 'ID']
+            product_stats = product_stats[product_stats['product_id'].isin(category_ids)]
         
         # Sort by order count and average rating
         product_stats = product_stats.sort_values(
@@ -307,17 +497,16 @@ class RecommendationSystem:
         
         # Get top products
         popular_products = []
-        for _, stat in product_stats.head(num_products).iterrows():
-            product = self.products[self.products['ID'] == stat['product_id']].iloc[0]
-            popular_products.append({
-                'product_id': product['ID'],
-                'product_name': product['Product_Name'],
-                'category': product['Category'],
-                'brand': product['Brand'],
-                'price': product['Price'],
-                'order_count': int(stat['order_count']),
-                'avg_rating': round(stat['avg_rating'], 1) if not pd.isna(stat['avg_rating']) else None,
+        top = product_stats.head(num_products)[['product_id', 'order_count', 'avg_rating']]
+        for product_id, order_count, avg_rating in top.itertuples(index=False):
+            if product_id not in catalog:
+                continue
+            card = catalog.card(product_id)
+            card.update({
+                'order_count': int(order_count),
+                'avg_rating': round(avg_rating, 1) if not pd.isna(avg_rating) else None,
                 'reason': "Popular product with high customer satisfaction"
             })
+            popular_products.append(card)
             
-        return popular_products 
\ No newline at end of file
+        return popular_products
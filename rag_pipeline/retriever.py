@@ -1,16 +1,93 @@
+import hashlib
+import os
+import shutil
+from typing import Optional, Sequence, Union
 from embedder import Embedder
-from vector_store import VectorStore
+from vector_store import VectorStore, ShardedVectorStore
 from config import TOP_K
 
+def fingerprint(texts: list[str], shard_keys: Optional[list[str]] = None) -> str:
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    if shard_keys is not None:
+        digest.update(b"\1shards")
+        for key in shard_keys:
+            digest.update(key.encode("utf-8"))
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+def index_directory(texts: list[str], index_dir: str, shard_keys: Optional[list[str]] = None) -> str:
+    """Each distinct set of texts gets its own directory, so a saved index is never overwritten while mapped"""
+    return os.path.join(index_dir, fingerprint(texts, shard_keys)[:16])
+
 class Retriever:
-    def __init__(self, texts: list[str]):
-        self.embedder = Embedder()
+    def __init__(self, texts: list[str], store: Optional[Union[VectorStore, ShardedVectorStore]] = None,
+                 embedder: Optional[Embedder] = None, shard_keys: Optional[list[str]] = None):
+        """With shard_keys (e.g. each text's category) the texts go into a ShardedVectorStore"""
+        self.embedder = embedder or Embedder()
         self.texts = texts
-        self.embeddings = self.embedder.embed(texts)
 
-        self.store = VectorStore(dimension=len(self.embeddings[0]))
-        self.store.add(self.embeddings, self.texts)
+        if store is None:
+            # The embedding matrix is only needed to fill the index; don't keep a second copy
+            embeddings = self.embedder.embed(texts)
+            if shard_keys is not None:
+                store = ShardedVectorStore(dimension=len(embeddings[0]))
+                store.add(embeddings, self.texts, shard_keys)
+            else:
+                store = VectorStore(dimension=len(embeddings[0]))
+                store.add(embeddings, self.texts)
+        self.store = store
+
+    @property
+    def sharded(self) -> bool:
+        return isinstance(self.store, ShardedVectorStore)
+
+    @classmethod
+    def load(cls, directory: str, embedder: Optional[Embedder] = None) -> "Retriever":
+        if ShardedVectorStore.is_saved(directory):
+            store = ShardedVectorStore.load(directory)
+        else:
+            store = VectorStore.load(directory)
+        return cls(store.documents, store=store, embedder=embedder)
+
+    @classmethod
+    def load_or_build(cls, texts: list[str], index_dir: str, embedder: Optional[Embedder] = None,
+                      shard_keys: Optional[list[str]] = None) -> "Retriever":
+        """Reuse the index saved for these exact texts under index_dir, else build and save it"""
+        directory = index_directory(texts, index_dir, shard_keys)
+        if os.path.isdir(directory):
+            return cls.load(directory, embedder)
+
+        retriever = cls(texts, embedder=embedder, shard_keys=shard_keys)
+        # Write to a private directory and rename, so readers never see a partial index
+        partial = f"{directory}.{os.getpid()}.tmp"
+        retriever.store.save(partial)
+        try:
+            os.rename(partial, directory)
+        except OSError:
+            # Another process saved the same index first
+            shutil.rmtree(partial, ignore_errors=True)
+        # Serve the mapped copy, so the builder doesn't keep a private heap copy of the vectors either
+        return cls.load(directory, retriever.embedder)
+
+    def rebuild_shard(self, key: str, texts: list[str]):
+        """Re-embed one shard of a sharded index; the other shards are left as they are"""
+        embeddings = self.embedder.embed(texts) if texts else []
+        self.store.rebuild_shard(key, embeddings, texts)
+        self.texts = self.store.documents
+
+    def get_candidates(self, query: str, top_k: int, categories: Optional[Sequence[str]] = None):
+        """(query vector, [(distance, chunk, stored vector), ...]) for the context builder"""
+        query_embedding = self.embedder.embed([query])
+        if categories and self.sharded:
+            return query_embedding[0], self.store.search_with_vectors(query_embedding, top_k, shards=categories)
+        return query_embedding[0], self.store.search_with_vectors(query_embedding, top_k)
 
-    def get_relevant_chunks(self, query: str):
+    def get_relevant_chunks(self, query: str, categories: Optional[Sequence[str]] = None):
+        """categories limits a sharded index to those shards; it is ignored by an unsharded one"""
         query_embedding = self.embedder.embed([query])
+        if categories and self.sharded:
+            return self.store.search(query_embedding, TOP_K, shards=categories)
         return self.store.search(query_embedding, TOP_K)
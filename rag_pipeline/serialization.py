@@ -0,0 +1,37 @@
+"""Response encoding for the API.
+
+orjson encodes NumPy scalars and arrays natively, so payloads built from
+pandas rows go straight to bytes without a recursive conversion pass or
+pydantic validation of dynamic dicts.
+"""
+from typing import Any
+
+import orjson
+import pandas as pd
+from fastapi.responses import Response
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson; bytes content is sent as already-encoded JSON"""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
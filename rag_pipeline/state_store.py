@@ -0,0 +1,219 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from recommendation_store import _to_builtin
+
+
+class StateStore:
+    """Mutable serving state (sessions, caches, versions and append-only logs).
+
+    The local implementation keeps everything in process memory; the SQLite one
+    lets every worker process on a host see the same state.
+    """
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    def set_if_absent(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set key only if it is missing or expired; True if this call set it (usable as a lock)"""
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str):
+        raise NotImplementedError
+
+    def incr(self, namespace: str, key: str, amount: int = 1) -> int:
+        raise NotImplementedError
+
+    def append(self, stream: str, records: List[Dict[str, Any]]) -> int:
+        """Append records to an ordered log; returns the sequence number of the last one"""
+        raise NotImplementedError
+
+    def read(self, stream: str, after_seq: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        """(seq, record) pairs appended after after_seq, oldest first"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Delete entries whose TTL has passed; returns how many were removed"""
+        raise NotImplementedError
+
+
+class LocalStateStore(StateStore):
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (namespace, key) -> (value, expires_at)
+        self._values: Dict[Tuple[str, str], Tuple[Any, Optional[float]]] = {}
+        self._logs: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._values.get((namespace, key))
+            if entry is None:
+                return None
+            if entry[1] is not None and entry[1] < time.time():
+                del self._values[(namespace, key)]
+                return None
+            return entry[0]
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._values[(namespace, key)] = (value, time.time() + ttl if ttl is not None else None)
+
+    def set_if_absent(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        with self._lock:
+            entry = self._values.get((namespace, key))
+            if entry is not None and (entry[1] is None or entry[1] >= now):
+                return False
+            self._values[(namespace, key)] = (value, now + ttl if ttl is not None else None)
+            return True
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._values.pop((namespace, key), None)
+
+    def incr(self, namespace: str, key: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self._values.get((namespace, key), (0, None))[0]) + amount
+            self._values[(namespace, key)] = (value, None)
+            return value
+
+    def append(self, stream: str, records: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            log = self._logs[stream]
+            log.extend(records)
+            return len(log)
+
+    def read(self, stream: str, after_seq: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            log = self._logs.get(stream, [])
+            return list(enumerate(log[after_seq:], start=after_seq + 1))
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._values.items()
+                       if expires_at is not None and expires_at < now]
+            for key in expired:
+                del self._values[key]
+            return len(expired)
+
+
+class SQLiteStateStore(StateStore):
+    """State shared by all worker processes on a host through one WAL-mode SQLite file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "namespace TEXT NOT NULL, "
+                "key TEXT NOT NULL, "
+                "value TEXT NOT NULL, "
+                "expires_at REAL, "
+                "PRIMARY KEY (namespace, key)"
+                ") WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS log ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "stream TEXT NOT NULL, "
+                "payload TEXT NOT NULL"
+                ")"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS log_stream_seq ON log (stream, seq)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread and per process: connections opened before a
+        # pre-fork must not be reused by the forked workers
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, separators=(",", ":"), default=_to_builtin),
+                 time.time() + ttl if ttl is not None else None)
+            )
+
+    def set_if_absent(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            # The upsert only replaces an expired row, so exactly one concurrent caller changes a row
+            return conn.execute(
+                "INSERT INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+                "WHERE kv.expires_at IS NOT NULL AND kv.expires_at < ?",
+                (namespace, key, json.dumps(value, separators=(",", ":"), default=_to_builtin),
+                 now + ttl if ttl is not None else None, now)
+            ).rowcount == 1
+
+    def delete(self, namespace: str, key: str):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def incr(self, namespace: str, key: str, amount: int = 1) -> int:
+        conn = self._connection()
+        with conn:
+            return conn.execute(
+                "INSERT INTO kv (namespace, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = CAST(value AS INTEGER) + excluded.value "
+                "RETURNING value",
+                (namespace, key, amount)
+            ).fetchone()[0]
+
+    def append(self, stream: str, records: List[Dict[str, Any]]) -> int:
+        payloads = [(stream, json.dumps(record, separators=(",", ":"), default=_to_builtin)) for record in records]
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT INTO log (stream, payload) VALUES (?, ?)", payloads)
+            return conn.execute("SELECT MAX(seq) FROM log WHERE stream = ?", (stream,)).fetchone()[0] or 0
+
+    def read(self, stream: str, after_seq: int = 0) -> List[Tuple[int, Dict[str, Any]]]:
+        rows = self._connection().execute(
+            "SELECT seq, payload FROM log WHERE stream = ? AND seq > ? ORDER BY seq", (stream, after_seq)
+        ).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    def purge_expired(self) -> int:
+        conn = self._connection()
+        with conn:
+            return conn.execute(
+                "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+            ).rowcount
+
+
+def create_state_store(url: str) -> StateStore:
+    """'local' for process memory, 'sqlite:///path/to/state.db' to share state between workers"""
+    if url == "local":
+        return LocalStateStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStateStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported state store: {url}")
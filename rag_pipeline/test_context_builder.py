@@ -0,0 +1,35 @@
+"""Regression tests for prompt context packing (run with: cd rag_pipeline && python -m pytest)"""
+import numpy as np
+
+from context_builder import build_context, estimate_tokens
+
+COLOURS = ["Brown", "White", "Golden", "Grey", "Black"]
+
+
+def _row(i: int, name: str) -> str:
+    return f"ID: {i} | Product Name: {name} | Category: Plywood | Color: {COLOURS[i % len(COLOURS)]} | Price: {1000 + i}"
+
+
+def test_relevant_row_past_the_budget_cut_is_packed():
+    rows = [_row(i, f"Commercial Plywood {i}mm") for i in range(1, 41)]
+    rows[29] = _row(30, "Teak Veneer Marine Board")
+    chunk = "\n".join(rows)
+    budget = estimate_tokens(rows[0]) * 5
+
+    packed = build_context("Do you have a teak veneer board?", np.ones(4), [(0.1, chunk, np.ones(4))], budget)
+
+    assert packed[0].startswith("ID: 30 |")
+    assert len(packed) <= 5
+
+
+def test_smaller_row_after_one_that_does_not_fit_is_still_packed():
+    long_row = _row(1, "Teak " + " ".join(f"Grade{i}" for i in range(60)))
+    short_row = _row(2, "Teak Strip")
+    other = _row(3, "Commercial Plywood 12mm")
+    hits = [(0.1, "\n".join([other, long_row, short_row]), np.ones(4))]
+    budget = estimate_tokens(other) + estimate_tokens(short_row) + 1
+
+    packed = build_context("teak strip", np.ones(4), hits, budget)
+
+    assert any(row.startswith("ID: 2 |") for row in packed)
+    assert not any(row.startswith("ID: 1 |") for row in packed)
@@ -0,0 +1,21 @@
+"""Regression tests for CSV chunking (run with: cd rag_pipeline && python -m pytest)"""
+import pandas as pd
+
+from document_loader import CHUNK_SIZE, split_rows
+
+
+def test_large_block_is_split_into_row_sized_chunks():
+    rows = 5000
+    frame = pd.DataFrame({
+        "ID": range(1, rows + 1),
+        "Product Name": [f"Product {i}" for i in range(1, rows + 1)],
+        "Category": ["Plywood", "Hardware", "Laminate", "Adhesive"] * (rows // 4),
+    })
+    chunks = split_rows(frame)
+
+    assert max(len(chunk) for chunk in chunks) <= CHUNK_SIZE
+    # Rows are ~60 characters, so a chunk holds a handful of them, never the whole block
+    assert len(chunks) >= rows * 60 // CHUNK_SIZE
+    assert all(chunk.startswith("ID: ") for chunk in chunks)
+    text = "\n".join(chunks)
+    assert "ID: 1 |" in text and f"ID: {rows} |" in text
@@ -0,0 +1,95 @@
+"""Regression tests for order ingestion (run with: cd rag_pipeline && python -m pytest)"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from catalog import ProductCatalog
+from recommendation_system import RecommendationSystem
+
+PRODUCTS = pd.DataFrame([
+    {"ID": 1, "Product Name": "BWP Marine Plywood 18mm", "Category": "Plywood", "Sub-Category": "Waterproof",
+     "Brand": "GreenPly", "Price": 1650, "Rating": 4.7},
+    {"ID": 2, "Product Name": "MR Commercial Plywood 12mm", "Category": "Plywood", "Sub-Category": "Interior",
+     "Brand": "Century", "Price": 1100, "Rating": 4.2},
+])
+
+
+def make_system() -> RecommendationSystem:
+    return RecommendationSystem(order_history=pd.DataFrame(), catalog=ProductCatalog(PRODUCTS))
+
+
+def test_malformed_order_date_is_rejected_and_later_syncs_work():
+    system = make_system()
+    result = system.ingest_orders([{"user_id": "5", "product_id": 2, "order_date": "garbage"}])
+    assert result["accepted"] == 0
+    assert result["rejected"][0]["index"] == 0
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    assert system.ingest_orders([{"user_id": "5", "product_id": 2, "order_date": today}])["accepted"] == 1
+    assert system.get_popular_products(5, mode="window", window_days=7)[0]["product_id"] == 2
+
+
+def test_future_order_date_is_rejected_and_trending_is_kept():
+    system = make_system()
+    today = datetime.now().strftime("%Y-%m-%d")
+    system.ingest_orders([{"user_id": "5", "product_id": 1, "order_date": today}])
+    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    for future in ("2099-01-01", tomorrow):
+        result = system.ingest_orders([{"user_id": "5", "product_id": 2, "order_date": future}])
+        assert result["accepted"] == 0
+        assert "future" in result["rejected"][0]["error"]
+
+    popular = system.get_popular_products(5, mode="window", window_days=7)
+    assert [product["product_id"] for product in popular] == [1]
+
+
+def test_bad_log_record_is_skipped_once():
+    system = make_system()
+    today = datetime.now().strftime("%Y-%m-%d")
+    good = system._normalize_order({"user_id": "5", "product_id": 1, "order_date": today})
+    # Written by an older worker that did not validate dates
+    system.state.append("orders", [dict(good, order_date="garbage"), good])
+
+    system.sync_orders()
+    assert len(system.orders) == 1
+    for _ in range(3):
+        system.get_popular_products(5)
+    assert len(system.orders) == 1
+
+
+@pytest.mark.parametrize("field, value", [
+    ("product_id", True),
+    ("product_id", 1.7),
+    ("product_id", "1.0"),
+    ("user_id", {"id": 5}),
+    ("user_id", False),
+    ("price_per_unit", "nan"),
+    ("price_per_unit", float("inf")),
+    ("rating", float("nan")),
+    ("total_amount", "NaN"),
+    ("quantity", 2.5),
+])
+def test_loosely_typed_order_fields_are_rejected(field, value):
+    system = make_system()
+    result = system.ingest_orders([dict({"user_id": "5", "product_id": 1}, **{field: value})])
+    assert result["accepted"] == 0
+    assert field in result["rejected"][0]["error"]
+    assert len(system.orders) == 0
+
+
+def test_integer_and_digit_string_ids_are_accepted():
+    system = make_system()
+    result = system.ingest_orders([{"user_id": 5, "product_id": "2"}, {"user_id": "USER_6", "product_id": 1}])
+    assert result["accepted"] == 2
+    assert sorted(system.order_history["user_id"]) == ["5", "6"]
+
+
+def test_non_utf8_orders_body_is_a_client_error():
+    from main import _parse_orders_body
+
+    with pytest.raises(HTTPException) as error:
+        _parse_orders_body('[{"user_id": "5", "product_id": 1, "note": "café"}]'.encode("latin-1"), False)
+    assert error.value.status_code == 400
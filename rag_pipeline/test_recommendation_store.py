@@ -0,0 +1,11 @@
+"""Regression tests for precomputed recommendations (run with: cd rag_pipeline && python -m pytest)"""
+from recommendation_store import RecommendationStore
+
+
+def test_row_is_stale_once_orders_or_catalog_move_on(tmp_path):
+    store = RecommendationStore(str(tmp_path / "recommendations.db"))
+    store.put_many([("5", [{"product_id": 1}], 3)], catalog_id="catalog-a")
+
+    assert store.get_fresh("5", 3600, order_version=3, catalog_id="catalog-a")[0] == [{"product_id": 1}]
+    assert store.get_fresh("5", 3600, order_version=4, catalog_id="catalog-a") is None
+    assert store.get_fresh("5", 3600, order_version=3, catalog_id="catalog-b") is None
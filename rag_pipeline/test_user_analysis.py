@@ -0,0 +1,48 @@
+"""Regression tests for user history analysis (run with: cd rag_pipeline && python -m pytest)"""
+import pandas as pd
+
+from ai_analyzer import AIAnalyzer
+from catalog import ProductCatalog
+from recommendation_system import RecommendationSystem
+
+PRODUCTS = pd.DataFrame([
+    {"ID": i, "Product Name": f"Hinge {i}", "Category": "Hardware", "Sub-Category": "Hinges",
+     "Brand": "Hettich", "Price": 40 + i, "Rating": 4.6, "Discount": "0%", "Stock": 10}
+    for i in range(1, 5)
+] + [
+    {"ID": 5, "Product Name": "Wood Glue", "Category": "Adhesive", "Sub-Category": "Glue",
+     "Brand": "Fevicol", "Price": 5000, "Rating": 4.1, "Discount": "5%", "Stock": 10},
+])
+
+
+def _orders(rows):
+    return pd.DataFrame([
+        {"order_id": f"ORD_{i}", "user_id": "5", "product_id": product_id, "product_name": name,
+         "category": category, "sub_category": "", "brand": brand, "quantity": 1, "price_per_unit": total,
+         "total_amount": total, "order_date": date, "rating": 5.0}
+        for i, (product_id, name, category, brand, total, date) in enumerate(rows)
+    ])
+
+
+def test_products_bought_before_the_recent_orders_are_not_recommended_again():
+    history = _orders([(1, "Hinge 1", "Hardware", "Hettich", 41, "2024-01-01")] +
+                      [(2, "Hinge 2", "Hardware", "Hettich", 42, f"2024-02-{day:02d}") for day in range(1, 26)])
+    system = RecommendationSystem(order_history=history, catalog=ProductCatalog(PRODUCTS))
+
+    analysis = AIAnalyzer()._basic_analysis(system.get_user_orders("5"))
+    assert "Hinge 1" not in {order["product_name"] for order in analysis["purchased_products"]}
+    assert 1 in analysis["purchased_product_ids"]
+
+    recommended = {card["product_id"] for card in system.get_local_recommendations("5", 5)}
+    assert recommended and not recommended & {1, 2}
+
+
+def test_preferred_categories_rank_by_order_count_not_spend():
+    history = _orders([(1, "Hinge 1", "Hardware", "Hettich", 41, "2024-01-01"),
+                       (2, "Hinge 2", "Hardware", "Hettich", 42, "2024-01-02"),
+                       (3, "Hinge 3", "Hardware", "Hettich", 43, "2024-01-03"),
+                       (5, "Wood Glue", "Adhesive", "Fevicol", 5000, "2024-01-04")])
+
+    preferences = AIAnalyzer()._basic_analysis(history)["preferences"]
+    assert preferences["preferred_categories"] == ["Hardware", "Adhesive"]
+    assert preferences["preferred_brands"] == ["Hettich", "Fevicol"]
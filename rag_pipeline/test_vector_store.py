@@ -0,0 +1,49 @@
+"""Regression tests for saved vector stores (run with: cd rag_pipeline && python -m pytest)"""
+import os
+
+import numpy as np
+
+from vector_store import INDEX_FILE, ShardedVectorStore, VectorStore
+
+
+def _anonymous_rss_bytes() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("RssAnon not reported")
+
+
+def _mapped_files() -> str:
+    with open("/proc/self/maps") as f:
+        return f.read()
+
+
+def test_loaded_index_is_memory_mapped(tmp_path):
+    vectors = np.random.default_rng(0).random((20000, 256), dtype=np.float32)
+    store = VectorStore(256)
+    store.add(vectors, [str(i) for i in range(len(vectors))])
+    store.save(str(tmp_path))
+    del store
+
+    before = _anonymous_rss_bytes()
+    loaded = VectorStore.load(str(tmp_path))
+    # Touch every vector, as a search does
+    assert loaded.search_with_distances(vectors[:1], top_k=1)[0][1] == "0"
+    heap_growth = _anonymous_rss_bytes() - before
+
+    assert os.path.join(str(tmp_path), INDEX_FILE) in _mapped_files()
+    assert heap_growth < vectors.nbytes / 4
+
+
+def test_adding_to_a_loaded_store_copies_it(tmp_path):
+    vectors = np.random.default_rng(1).random((10, 8), dtype=np.float32)
+    sharded = ShardedVectorStore(8)
+    sharded.add(vectors, [str(i) for i in range(10)], ["a"] * 10)
+    sharded.save(str(tmp_path))
+
+    loaded = ShardedVectorStore.load(str(tmp_path))
+    loaded.add(vectors[:1] + 100, ["new"], ["a"])
+
+    assert loaded.search(vectors[:1] + 100, top_k=1) == ["new"]
+    assert len(loaded.shards["a"].documents) == 11
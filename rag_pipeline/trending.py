@@ -0,0 +1,227 @@
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from config import TRENDING_HALF_LIVES_DAYS, TRENDING_WINDOWS_DAYS
+
+# Rescale forward-decay scores before exp() gets anywhere near float overflow
+_MAX_EXPONENT = 300.0
+
+
+class DecayedCounter:
+    """Exponentially decayed counts with top-k served from a lazy max-heap.
+
+    Uses forward decay: an event on day d adds exp(rate * (d - landmark)), so every
+    score decays at the same rate and the relative order never changes with time.
+    That lets the heap stay valid between updates; outdated heap entries are
+    skipped (and dropped) when top-k pops them.
+    """
+
+    def __init__(self, half_life_days: float):
+        self.half_life_days = half_life_days
+        self.rate = math.log(2) / half_life_days
+        self.landmark: Optional[int] = None
+        self.scores: Dict[Hashable, float] = {}
+        self._heap: List[Tuple[float, Hashable]] = []
+
+    def add(self, key: Hashable, day: int, weight: float = 1.0):
+        if self.landmark is None:
+            self.landmark = day
+        exponent = self.rate * (day - self.landmark)
+        if exponent > _MAX_EXPONENT:
+            self._rebase(day)
+            exponent = 0.0
+        score = self.scores.get(key, 0.0) + weight * math.exp(exponent)
+        self.scores[key] = score
+        heapq.heappush(self._heap, (-score, key))
+        if len(self._heap) > 2 * len(self.scores) + 64:
+            self._rebuild_heap()
+
+    def _rebase(self, day: int):
+        factor = math.exp(-self.rate * (day - self.landmark))
+        self.scores = {key: score * factor for key, score in self.scores.items()}
+        self.landmark = day
+        self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = [(-score, key) for key, score in self.scores.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k: int, now_day: int) -> List[Tuple[Hashable, float]]:
+        """Top k keys with their scores decayed to now_day, in O(k log n)"""
+        if self.landmark is None:
+            return []
+        results = []
+        seen = set()
+        while self._heap and len(results) < k:
+            neg_score, key = heapq.heappop(self._heap)
+            if self.scores.get(key) == -neg_score and key not in seen:
+                seen.add(key)
+                results.append((key, -neg_score))
+        for key, score in results:
+            heapq.heappush(self._heap, (-score, key))
+        scale = math.exp(-self.rate * (now_day - self.landmark))
+        return [(key, score * scale) for key, score in results]
+
+
+class WindowCounter:
+    """Counts over sliding windows of whole days, maintained incrementally as days advance"""
+
+    def __init__(self, windows: Iterable[int]):
+        self.windows = sorted(windows)
+        self.daily: Dict[int, Counter] = defaultdict(Counter)
+        self.totals: Dict[int, Counter] = {window: Counter() for window in self.windows}
+        self.current_day: Optional[int] = None
+
+    def advance(self, day: int):
+        if self.current_day is None:
+            self.current_day = day
+            return
+        if day - self.current_day >= self.windows[-1]:
+            # Everything has expired; skip the day-by-day walk
+            self.daily.clear()
+            self.totals = {window: Counter() for window in self.windows}
+            self.current_day = day
+            return
+        while self.current_day < day:
+            self.current_day += 1
+            for window in self.windows:
+                expired = self.daily.get(self.current_day - window)
+                if expired:
+                    totals = self.totals[window]
+                    totals.subtract(expired)
+                    for key in expired:
+                        if totals[key] <= 0:
+                            del totals[key]
+            self.daily.pop(self.current_day - self.windows[-1], None)
+
+    def add(self, key: Hashable, day: int, weight: float = 1.0):
+        self.advance(day)
+        if day <= self.current_day - self.windows[-1]:
+            return  # older than the longest window
+        self.daily[day][key] += weight
+        for window in self.windows:
+            if day > self.current_day - window:
+                self.totals[window][key] += weight
+
+    def top(self, k: int, window: int) -> List[Tuple[Hashable, float]]:
+        return heapq.nlargest(k, self.totals[window].items(), key=lambda item: item[1])
+
+
+class TrendingEngine:
+    """Time-decayed and windowed popularity per product and per category.
+
+    Counters are updated incrementally as orders arrive; queries never rescan the
+    order history.
+    """
+
+    def __init__(self, half_lives_days: Iterable[float] = TRENDING_HALF_LIVES_DAYS,
+                 windows_days: Iterable[int] = TRENDING_WINDOWS_DAYS):
+        self.half_lives_days = list(half_lives_days)
+        self.windows_days = list(windows_days)
+        self._lock = threading.Lock()
+        self._day_cache: Dict[str, int] = {}
+        self._products = {h: DecayedCounter(h) for h in self.half_lives_days}
+        self._categories = {h: DecayedCounter(h) for h in self.half_lives_days}
+        self._products_by_category: Dict[str, Dict[float, DecayedCounter]] = {}
+        self._product_windows = WindowCounter(self.windows_days)
+        self._category_windows = WindowCounter(self.windows_days)
+        self._product_windows_by_category: Dict[str, WindowCounter] = {}
+
+    def _day(self, order_date: Any) -> int:
+        if isinstance(order_date, (date, datetime)):
+            return order_date.toordinal()
+        key = str(order_date)
+        day = self._day_cache.get(key)
+        if day is None:
+            day = datetime.strptime(key[:10], "%Y-%m-%d").toordinal()
+            self._day_cache[key] = day
+        return day
+
+    def _record(self, product_id: int, category: str, day: int, weight: float):
+        by_category = self._products_by_category.get(category)
+        if by_category is None:
+            by_category = {h: DecayedCounter(h) for h in self.half_lives_days}
+            self._products_by_category[category] = by_category
+            self._product_windows_by_category[category] = WindowCounter(self.windows_days)
+        for half_life in self.half_lives_days:
+            self._products[half_life].add(product_id, day, weight)
+            self._categories[half_life].add(category, day, weight)
+            by_category[half_life].add(product_id, day, weight)
+        self._product_windows.add(product_id, day, weight)
+        self._category_windows.add(category, day, weight)
+        self._product_windows_by_category[category].add(product_id, day, weight)
+
+    def record_orders(self, orders: Iterable[Dict[str, Any]]):
+        """Apply new orders to every counter"""
+        with self._lock:
+            for order in orders:
+                self._record(int(order['product_id']), str(order['category']), self._day(order['order_date']), 1.0)
+
+    def record_frame(self, orders: pd.DataFrame):
+        """Bulk-load a history, collapsing it to one update per (product, category, day)"""
+        if orders.empty:
+            return
+        grouped = (
+            orders.assign(category=orders['category'].astype(str), order_date=orders['order_date'].astype(str))
+            .groupby(['order_date', 'product_id', 'category'], sort=True, observed=True)
+            .size()
+        )
+        with self._lock:
+            for (order_date, product_id, category), count in grouped.items():
+                self._record(int(product_id), category, self._day(order_date), float(count))
+
+    def _now(self, now: Optional[datetime]) -> int:
+        today = (now or datetime.now()).toordinal()
+        return max(today, self._product_windows.current_day or today)
+
+    def current_day(self, now: Optional[datetime] = None) -> int:
+        """Day ordinal that decayed and window scores are computed for; answers change when it does"""
+        return self._now(now)
+
+    def _validate(self, mode: str, half_life_days: Optional[float], window_days: Optional[int]):
+        if mode not in ("decayed", "window"):
+            raise ValueError("mode must be 'decayed' or 'window'")
+        if mode == "decayed" and half_life_days not in self.half_lives_days:
+            raise ValueError(f"half_life_days must be one of {self.half_lives_days}")
+        if mode == "window" and window_days not in self.windows_days:
+            raise ValueError(f"window_days must be one of {self.windows_days}")
+
+    def top_products(self, k: int, mode: str = "decayed", half_life_days: Optional[float] = None,
+                     window_days: Optional[int] = None, category: Optional[str] = None,
+                     now: Optional[datetime] = None) -> List[Tuple[int, float]]:
+        """Top k (product_id, score) pairs, optionally restricted to one category"""
+        half_life_days = half_life_days if half_life_days is not None else self.half_lives_days[0]
+        window_days = window_days if window_days is not None else self.windows_days[0]
+        self._validate(mode, half_life_days, window_days)
+        with self._lock:
+            now_day = self._now(now)
+            self._product_windows.advance(now_day)
+            if category is not None:
+                if category not in self._products_by_category:
+                    return []
+                if mode == "decayed":
+                    return self._products_by_category[category][half_life_days].top(k, now_day)
+                windows = self._product_windows_by_category[category]
+                windows.advance(now_day)
+                return windows.top(k, window_days)
+            if mode == "decayed":
+                return self._products[half_life_days].top(k, now_day)
+            return self._product_windows.top(k, window_days)
+
+    def top_categories(self, k: int, mode: str = "decayed", half_life_days: Optional[float] = None,
+                       window_days: Optional[int] = None, now: Optional[datetime] = None) -> List[Tuple[str, float]]:
+        half_life_days = half_life_days if half_life_days is not None else self.half_lives_days[0]
+        window_days = window_days if window_days is not None else self.windows_days[0]
+        self._validate(mode, half_life_days, window_days)
+        with self._lock:
+            now_day = self._now(now)
+            if mode == "decayed":
+                return self._categories[half_life_days].top(k, now_day)
+            self._category_windows.advance(now_day)
+            return self._category_windows.top(k, window_days)
@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import RECENT_ORDERS_LIMIT, TOP_FEATURE_VALUES, PRICE_BANDS, PURCHASED_PRODUCTS_LIMIT
+
+RECENT_ORDER_COLUMNS = [
+    'order_id', 'product_name', 'category', 'brand', 'quantity',
+    'price_per_unit', 'total_amount', 'order_date', 'rating'
+]
+
+
+def _shares(values: pd.Series, weights: pd.Series, top_n: int) -> Dict[str, float]:
+    """Top-n share of total weight per value, e.g. spend share per category"""
+    totals = weights.groupby(values.astype(str), sort=False).sum()
+    total = totals.sum()
+    if total <= 0:
+        return {}
+    return {str(key): round(float(value / total), 3) for key, value in totals.nlargest(top_n).items()}
+
+
+def _price_bands(prices: pd.Series) -> Dict[str, float]:
+    edges = list(PRICE_BANDS) + [np.inf]
+    labels = [
+        f"{int(low)}-{int(high)}" if np.isfinite(high) else f"{int(low)}+"
+        for low, high in zip(edges[:-1], edges[1:])
+    ]
+    bands = pd.cut(prices, bins=edges, labels=labels, right=False)
+    distribution = bands.value_counts(normalize=True, sort=False)
+    return {str(label): round(float(share), 3) for label, share in distribution.items() if share > 0}
+
+
+def _recent_orders(user_orders: pd.DataFrame, limit: int):
+    recent = user_orders.sort_values('order_date', ascending=False, kind='stable').head(limit)
+    orders = []
+    for row in recent[RECENT_ORDER_COLUMNS].itertuples(index=False):
+        orders.append({
+            "order_id": str(row.order_id),
+            "product_name": str(row.product_name),
+            "category": str(row.category),
+            "brand": str(row.brand),
+            "quantity": int(row.quantity),
+            "price_per_unit": float(row.price_per_unit),
+            "total_amount": float(row.total_amount),
+            "order_date": str(row.order_date),
+            "rating": float(row.rating) if pd.notna(row.rating) else None
+        })
+    return orders
+
+
+def _purchased_product_ids(user_orders: pd.DataFrame, limit: int):
+    """Distinct product IDs, most recently ordered first"""
+    recent = user_orders.sort_values('order_date', ascending=False, kind='stable')
+    ids = pd.to_numeric(recent['product_id'], errors='coerce').dropna().astype(int).drop_duplicates()
+    return ids.head(limit).tolist()
+
+
+def extract_user_features(user_orders: pd.DataFrame, recent_limit: int = RECENT_ORDERS_LIMIT,
+                          top_n: int = TOP_FEATURE_VALUES, reference_date: Optional[datetime] = None,
+                          purchased_limit: int = PURCHASED_PRODUCTS_LIMIT) -> Dict[str, Any]:
+    """Compact, fixed-size summary of a user's order history.
+
+    RFM metrics, category/brand spend shares, price-band distribution and rating
+    stats are computed with vectorized aggregations, so the output size does not
+    grow with the number of orders. Only the last `recent_limit` orders are kept
+    verbatim; `purchased_product_ids` holds up to `purchased_limit` distinct
+    products for excluding repeats, and is not meant for the behavior prompt.
+    """
+    if user_orders.empty:
+        return {"total_orders": 0, "total_spent": 0.0, "recent_orders": [], "purchased_product_ids": []}
+
+    spend = pd.to_numeric(user_orders['total_amount'], errors='coerce').fillna(0.0)
+    ratings = pd.to_numeric(user_orders['rating'], errors='coerce')
+    dates = pd.to_datetime(user_orders['order_date'], errors='coerce')
+    first_date, last_date = dates.min(), dates.max()
+    reference_date = pd.Timestamp(reference_date or datetime.now())
+    active_months = max((last_date - first_date).days / 30.0, 1.0) if pd.notna(first_date) else 1.0
+
+    total_orders = int(len(user_orders))
+    total_spent = float(spend.sum())
+    rated = ratings.dropna()
+    return {
+        "total_orders": total_orders,
+        "total_spent": round(total_spent, 2),
+        "average_order_value": round(total_spent / total_orders, 2),
+        "total_quantity": int(pd.to_numeric(user_orders['quantity'], errors='coerce').fillna(0).sum()),
+        "first_order_date": first_date.strftime("%Y-%m-%d") if pd.notna(first_date) else None,
+        "last_order_date": last_date.strftime("%Y-%m-%d") if pd.notna(last_date) else None,
+        "recency_days": int((reference_date - last_date).days) if pd.notna(last_date) else None,
+        "orders_per_month": round(total_orders / active_months, 2),
+        "category_spend_share": _shares(user_orders['category'], spend, top_n),
+        "brand_spend_share": _shares(user_orders['brand'], spend, top_n),
+        "price_band_distribution": _price_bands(pd.to_numeric(user_orders['price_per_unit'], errors='coerce')),
+        "rating_stats": {
+            "average": round(float(rated.mean()), 2) if not rated.empty else None,
+            "count": int(rated.size),
+            "min": float(rated.min()) if not rated.empty else None,
+            "max": float(rated.max()) if not rated.empty else None
+        },
+        "recent_orders": _recent_orders(user_orders, recent_limit),
+        "purchased_product_ids": _purchased_product_ids(user_orders, purchased_limit)
+    }
@@ -1,15 +1,187 @@
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence
 import faiss
 import numpy as np
+from config import VECTOR_HASH_SHARDS, VECTOR_SEARCH_THREADS
+from telemetry import span
+
+INDEX_FILE = "index.faiss"
+DOCUMENTS_FILE = "documents.json"
+MANIFEST_FILE = "shards.json"
 
 class VectorStore:
     def __init__(self, dimension: int):
         self.index = faiss.IndexFlatL2(dimension)
         self.documents = []
+        self.mapped = False
 
     def add(self, embeddings, docs):
+        if self.mapped:
+            # A memory-mapped index is a read-only view of the file (adding to it aborts the process);
+            # continue on a private copy of its vectors
+            index = faiss.IndexFlatL2(self.index.d)
+            if self.index.ntotal:
+                index.add(self.index.reconstruct_n(0, self.index.ntotal))
+            self.index = index
+            self.mapped = False
         self.index.add(np.array(embeddings))
         self.documents.extend(docs)
 
     def search(self, embedding, top_k=5):
+        with span("faiss_search"):
+            D, I = self.index.search(np.array(embedding), k=top_k)
+        # FAISS pads with -1 when the index holds fewer than top_k vectors
+        return [self.documents[i] for i in I[0] if i >= 0]
+
+    def search_with_distances(self, embedding, top_k=5) -> List[tuple]:
+        """(distance, document) pairs, nearest first"""
         D, I = self.index.search(np.array(embedding), k=top_k)
-        return [self.documents[i] for i in I[0]]
+        return [(float(d), self.documents[i]) for d, i in zip(D[0], I[0]) if i >= 0]
+
+    def search_with_vectors(self, embedding, top_k=5) -> List[tuple]:
+        """(distance, document, stored vector) triples, nearest first"""
+        with span("faiss_search"):
+            return self._search_with_vectors(embedding, top_k)
+
+    def _search_with_vectors(self, embedding, top_k=5) -> List[tuple]:
+        D, I = self.index.search(np.array(embedding), k=top_k)
+        hits = [(float(d), int(i)) for d, i in zip(D[0], I[0]) if i >= 0]
+        if not hits:
+            return []
+        vectors = self.index.reconstruct_batch(np.array([i for _, i in hits], dtype=np.int64))
+        return [(d, self.documents[i], vector) for (d, i), vector in zip(hits, vectors)]
+
+    def save(self, directory: str):
+        """Write the index and its documents so other processes can load them without re-embedding"""
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(directory, INDEX_FILE))
+        with open(os.path.join(directory, DOCUMENTS_FILE), "w") as f:
+            json.dump(self.documents, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "VectorStore":
+        """Load a saved store; with mmap the vectors are paged in from the file and shared by every process"""
+        # IO_FLAG_MMAP alone still copies a flat index's codes onto the heap; MMAP_IFC maps them in place
+        index = faiss.read_index(os.path.join(directory, INDEX_FILE), faiss.IO_FLAG_MMAP_IFC if mmap else 0)
+        store = cls.__new__(cls)
+        store.index = index
+        store.mapped = mmap
+        with open(os.path.join(directory, DOCUMENTS_FILE)) as f:
+            store.documents = json.load(f)
+        return store
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def _search_pool() -> ThreadPoolExecutor:
+    """Shared by every sharded store; recreated after a fork, since threads don't survive it"""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=VECTOR_SEARCH_THREADS, thread_name_prefix="shard-search")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def hash_shard_key(document: str, num_shards: int = VECTOR_HASH_SHARDS) -> str:
+    return f"hash-{zlib.crc32(document.encode('utf-8')) % num_shards}"
+
+
+class ShardedVectorStore:
+    """Independent FAISS indexes keyed by shard (a category, or a hash bucket of the document).
+
+    Searches fan out to the shards on a thread pool (FAISS releases the GIL) and
+    the per-shard nearest lists are merged. Shards are replaced whole, so
+    rebuilding one never touches the others, and a search in flight keeps the
+    shard dict it started with.
+    """
+
+    def __init__(self, dimension: int, num_hash_shards: int = VECTOR_HASH_SHARDS):
+        self.dimension = dimension
+        self.num_hash_shards = num_hash_shards
+        self.shards: Dict[str, VectorStore] = {}
+
+    @property
+    def documents(self) -> List[str]:
+        return [doc for key in sorted(self.shards) for doc in self.shards[key].documents]
+
+    def add(self, embeddings, docs, keys: Optional[Sequence[str]] = None):
+        """Add vectors to the shards named by keys (default: by hash of the document)"""
+        if keys is None:
+            keys = [hash_shard_key(doc, self.num_hash_shards) for doc in docs]
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        positions: Dict[str, List[int]] = {}
+        for position, key in enumerate(keys):
+            positions.setdefault(str(key), []).append(position)
+        shards = dict(self.shards)
+        for key, rows in positions.items():
+            shard = shards.get(key)
+            if shard is None:
+                shard = shards[key] = VectorStore(self.dimension)
+            shard.add(embeddings[rows], [docs[i] for i in rows])
+        self.shards = shards
+
+    def rebuild_shard(self, key: str, embeddings, docs):
+        """Replace one shard's contents; an empty docs list drops the shard"""
+        shards = dict(self.shards)
+        if len(docs):
+            shard = VectorStore(self.dimension)
+            shard.add(np.asarray(embeddings, dtype=np.float32), list(docs))
+            shards[key] = shard
+        else:
+            shards.pop(key, None)
+        self.shards = shards
+
+    def _fan_out(self, search: Callable, embedding, top_k: int, shards: Optional[Sequence[str]]) -> List[tuple]:
+        """Run search(shard, embedding, top_k) on the target shards and merge the hits by distance"""
+        current = self.shards
+        targets = [current[key] for key in shards if key in current] if shards is not None else list(current.values())
+        with span("faiss_search"):
+            if len(targets) <= 1:
+                per_shard = [search(shard, embedding, top_k) for shard in targets]
+            else:
+                per_shard = list(_search_pool().map(lambda shard: search(shard, embedding, top_k), targets))
+            merged = heapq.merge(*per_shard, key=lambda hit: hit[0])
+            return list(itertools.islice(merged, top_k))
+
+    def search(self, embedding, top_k=5, shards: Optional[Sequence[str]] = None):
+        """Nearest documents across all shards, or only the named ones (unknown names are ignored)"""
+        return [hit[1] for hit in self._fan_out(VectorStore.search_with_distances, embedding, top_k, shards)]
+
+    def search_with_vectors(self, embedding, top_k=5, shards: Optional[Sequence[str]] = None) -> List[tuple]:
+        """(distance, document, stored vector) triples across the shards, nearest first"""
+        return self._fan_out(VectorStore._search_with_vectors, embedding, top_k, shards)
+
+    def save(self, directory: str):
+        """One VectorStore directory per shard plus a manifest of shard keys"""
+        os.makedirs(directory, exist_ok=True)
+        manifest = {}
+        for key, shard in self.shards.items():
+            name = "shard-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+            shard.save(os.path.join(directory, name))
+            manifest[key] = name
+        with open(os.path.join(directory, MANIFEST_FILE), "w") as f:
+            json.dump({"dimension": self.dimension, "num_hash_shards": self.num_hash_shards, "shards": manifest}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "ShardedVectorStore":
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        store = cls(manifest["dimension"], manifest["num_hash_shards"])
+        store.shards = {key: VectorStore.load(os.path.join(directory, name), mmap)
+                        for key, name in manifest["shards"].items()}
+        return store
+
+    @staticmethod
+    def is_saved(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, MANIFEST_FILE))